@@ -1,53 +1,85 @@
-from typing import Generator, Optional
+from typing import AsyncGenerator, Optional
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from jose import jwt, JWTError
+from jose import JWTError
 from pydantic import ValidationError
-from sqlalchemy.orm import Session
+from sqlalchemy import event, inspect, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.cache import TTLCache
 from app.core.config import settings
-from app.db.session import SessionLocal
+from app.core.metrics import current_request
+from app.core.security import decode_access_token
+from app.db.session import AsyncSessionLocal
 from app.models.models import User
-from app.schemas.schemas import TokenData
+from app.schemas.schemas import User as UserSchema
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl=f"{settings.API_V1_STR}/auth/login")
 
-def get_db() -> Generator:
-    try:
-        db = SessionLocal()
+# Token subject (email) -> resolved identity, so repeat requests of a session
+# authenticate without a users query. Entries are dropped whenever the user
+# row is changed through the ORM; the TTL bounds staleness across workers.
+user_cache = TTLCache(settings.USER_CACHE_SIZE, settings.USER_CACHE_TTL_SECONDS)
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def invalidate_cached_user(mapper, connection, target: User) -> None:
+    history = inspect(target).attrs.email.history
+    for email in (*history.deleted, target.email):
+        user_cache.pop(email)
+
+async def get_db() -> AsyncGenerator[AsyncSession, None]:
+    # The single request-scoped session: FastAPI caches dependency results per
+    # request, so get_current_user and the handler share this session (and
+    # its one pooled connection) as long as both depend on this function.
+    async with AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
 
-def get_current_user(
-    db: Session = Depends(get_db),
+def query_budget(limit: int):
+    """
+    Route dependency declaring the most SQL statements one request may run,
+    authentication included. Enforced per QUERY_BUDGET_MODE:
+
+        @router.get("/items", dependencies=[query_budget(2)])
+    """
+    async def declare_query_budget() -> None:
+        stats = current_request.get()
+        if stats is not None:
+            stats.budget = limit
+    return Depends(declare_query_budget)
+
+async def get_current_user(
+    db: AsyncSession = Depends(get_db),
     token: str = Depends(oauth2_scheme)
-) -> User:
+) -> UserSchema:
     try:
-        payload = jwt.decode(
-            token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM]
-        )
-        token_data = TokenData(**payload)
+        token_data = decode_access_token(token)
     except (JWTError, ValidationError):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Could not validate credentials",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    user = db.query(User).filter(User.email == token_data.sub).first()
+    cached = user_cache.get(token_data.sub)
+    if cached is not None:
+        return cached
+    result = await db.execute(select(User).where(User.email == token_data.sub))
+    user = result.scalars().first()
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
-    return user
+    identity = UserSchema.model_validate(user)
+    user_cache.set(token_data.sub, identity)
+    return identity
 
-def get_current_active_user(
-    current_user: User = Depends(get_current_user),
-) -> User:
+async def get_current_active_user(
+    current_user: UserSchema = Depends(get_current_user),
+) -> UserSchema:
     return current_user
 
-def get_current_admin_user(
-    current_user: User = Depends(get_current_user),
-) -> User:
+async def get_current_admin_user(
+    current_user: UserSchema = Depends(get_current_user),
+) -> UserSchema:
     if not current_user.is_admin:
         raise HTTPException(
             status_code=400, detail="The user doesn't have enough privileges"
         )
-    return current_user 
\ No newline at end of file
+    return current_user
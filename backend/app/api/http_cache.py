@@ -0,0 +1,63 @@
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime
+from typing import Any, Dict, Optional
+from fastapi import Request, Response
+from sqlalchemy import func
+from app.core.response_cache import CachedResponse
+
+# Clients may keep catalog responses but must revalidate them on every use;
+# revalidation is answered with 304 from a single cheap version query.
+CATALOG_CACHE_CONTROL = "no-cache"
+
+
+def last_change(model: Any) -> Any:
+    """SQL expression for the newest created/updated timestamp of a table."""
+    return func.max(func.coalesce(model.updated_at, model.created_at))
+
+
+def newest(*timestamps: Optional[datetime]) -> Optional[datetime]:
+    present = [t for t in timestamps if t is not None]
+    return max(present) if present else None
+
+
+def make_etag(*parts: Any) -> str:
+    """Strong validator for a representation identified by ``parts``."""
+    return '"' + hashlib.sha1(repr(parts).encode()).hexdigest() + '"'
+
+
+def validator_headers(etag: str, last_modified: Optional[datetime] = None) -> Dict[str, str]:
+    headers = {"ETag": etag, "Cache-Control": CATALOG_CACHE_CONTROL}
+    if last_modified is not None:
+        if last_modified.tzinfo is None:
+            last_modified = last_modified.replace(tzinfo=timezone.utc)
+        headers["Last-Modified"] = format_datetime(last_modified.astimezone(timezone.utc), usegmt=True)
+    return headers
+
+
+def etag_matches(request: Request, etag: Optional[str]) -> bool:
+    """
+    Evaluate If-None-Match against ``etag``.
+
+    Only entity tags decide: Last-Modified is sent for information, but a max
+    timestamp does not change when a row is deleted, so If-Modified-Since is
+    not trusted to produce a 304.
+    """
+    header = request.headers.get("if-none-match")
+    if not header or not etag:
+        return False
+    if header.strip() == "*":
+        return True
+    # If-None-Match uses weak comparison
+    candidates = {tag.strip().removeprefix("W/") for tag in header.split(",")}
+    return etag in candidates
+
+
+def not_modified(headers: Dict[str, str]) -> Response:
+    return Response(status_code=304, headers=headers)
+
+
+def cached_or_not_modified(request: Request, cached: CachedResponse) -> Response:
+    if etag_matches(request, cached.headers.get("ETag")):
+        return not_modified(cached.headers)
+    return cached.to_response()
@@ -0,0 +1,143 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+from typing import Any, Callable, List, Optional, Sequence
+from fastapi import HTTPException, Response, status
+from sqlalchemy import DateTime, bindparam, tuple_
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.functions import FunctionElement
+
+# Response header carrying the cursor of the next page (absent on the last page)
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    """Pack the sort key of the last row into an opaque, URL-safe token."""
+    payload = [v.isoformat() if isinstance(v, datetime) else v for v in values]
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> List[Any]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(raw)
+    except (binascii.Error, ValueError):
+        values = None
+    if not isinstance(values, list):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor"
+        )
+    return values
+
+
+class sort_key(FunctionElement):
+    """
+    A keyset column, or a cursor value bound for it, in a form that orders and
+    compares consistently on every backend.
+
+    Only SQLite needs a conversion: it keeps datetimes as text, and rows
+    stamped by ``CURRENT_TIMESTAMP`` ("2024-01-01 10:00:00") do not compare
+    equal to the same instant bound by SQLAlchemy ("2024-01-01
+    10:00:00.000000"), so a cursor on a tie would never move past it. Both
+    sides are normalized there, at the cost of the index order; PostgreSQL
+    gets the bare column.
+    """
+    inherit_cache = True
+
+    def __init__(self, expression: Any):
+        super().__init__(expression)
+        self.type = expression.type
+
+
+@compiles(sort_key)
+def _compile_sort_key(element, compiler, **kw):
+    return compiler.process(element.clauses, **kw)
+
+
+@compiles(sort_key, "sqlite")
+def _compile_sort_key_sqlite(element, compiler, **kw):
+    return f"strftime('%Y-%m-%d %H:%M:%f', {compiler.process(element.clauses, **kw)})"
+
+
+class Keyset:
+    """
+    Seek pagination over a stable, unique sort key such as ``(id)`` or
+    ``(price, id)``.
+
+    Instead of ``OFFSET`` the next page is selected with a row comparison
+    ``(price, id) > (:price, :id)``, so with a matching composite index every
+    page costs the same as the first one.
+    """
+
+    def __init__(self, *columns: Any, descending: bool = False):
+        self.columns = columns
+        self.descending = descending
+
+    @staticmethod
+    def _sort_key(column: Any, expression: Any = None) -> Any:
+        expression = column if expression is None else expression
+        return sort_key(expression) if isinstance(column.type, DateTime) else expression
+
+    def _coerce(self, values: List[Any]) -> List[Any]:
+        if len(values) != len(self.columns):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor"
+            )
+        coerced = []
+        for column, value in zip(self.columns, values):
+            try:
+                python_type = column.type.python_type
+            except NotImplementedError:
+                python_type = None
+            try:
+                if value is None:
+                    pass
+                elif python_type is datetime:
+                    value = datetime.fromisoformat(value)
+                elif python_type in (int, float):
+                    value = python_type(value)
+            except (TypeError, ValueError):
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor"
+                )
+            coerced.append(value)
+        return coerced
+
+    def apply(self, query: Any, cursor: Optional[str], limit: int, skip: int = 0) -> Any:
+        """
+        Order ``query`` by the key and restrict it to the page after ``cursor``.
+
+        One extra row is requested so that the caller can tell whether a next
+        page exists without a second query. ``skip`` is only honoured for
+        offset-style requests that do not send a cursor.
+        """
+        keys = [self._sort_key(c) for c in self.columns]
+        if cursor:
+            key = tuple_(*keys)
+            bound = tuple_(*(
+                self._sort_key(c, bindparam(None, v, type_=c.type))
+                for c, v in zip(self.columns, self._coerce(decode_cursor(cursor)))
+            ))
+            query = query.filter(key < bound if self.descending else key > bound)
+        elif skip:
+            query = query.offset(skip)
+        order = [k.desc() if self.descending else k.asc() for k in keys]
+        return query.order_by(*order).limit(limit + 1)
+
+    def page(
+        self,
+        rows: Sequence[Any],
+        limit: int,
+        response: Response,
+        key: Optional[Callable[[Any], Sequence[Any]]] = None,
+    ) -> List[Any]:
+        """Trim the look-ahead row and publish the next cursor, if any."""
+        rows = list(rows)
+        if len(rows) > limit:
+            rows = rows[:limit]
+            last = rows[-1]
+            values = key(last) if key else [getattr(last, c.key) for c in self.columns]
+            response.headers[NEXT_CURSOR_HEADER] = encode_cursor(values)
+        return rows
@@ -0,0 +1,36 @@
+"""
+Fast JSON path for list responses (enabled with ``FAST_JSON``).
+
+By default FastAPI validates a handler's return value against its
+``response_model``, converts the result to plain Python objects and encodes
+those with the stdlib ``json`` module. With ``FAST_JSON`` list handlers
+instead return ``serialize(adapter, rows)``: the ORM rows are validated once
+by a precompiled ``TypeAdapter`` and written to JSON bytes by pydantic-core,
+and the returned ``Response`` bypasses FastAPI's second validation.
+``response_model`` stays on the route for the OpenAPI schema. Every other
+response is encoded with orjson through ``default_response_class``.
+"""
+from typing import Any, Mapping, Optional, Type
+from fastapi import Response
+from fastapi.responses import JSONResponse, ORJSONResponse
+from pydantic import TypeAdapter
+from app.core.config import settings
+
+
+def default_response_class() -> Type[JSONResponse]:
+    return ORJSONResponse if settings.FAST_JSON else JSONResponse
+
+
+def dump_json(adapter: TypeAdapter, value: Any) -> bytes:
+    """Validate ORM objects with ``adapter`` and encode them in one pass."""
+    return adapter.dump_json(adapter.validate_python(value, from_attributes=True))
+
+
+def serialize(adapter: TypeAdapter, value: Any, headers: Optional[Mapping[str, str]] = None) -> Any:
+    """
+    ``value`` as a ready JSON response when ``FAST_JSON`` is on, otherwise
+    ``value`` itself for FastAPI to serialize through ``response_model``.
+    """
+    if not settings.FAST_JSON:
+        return value
+    return Response(content=dump_json(adapter, value), media_type="application/json", headers=headers)
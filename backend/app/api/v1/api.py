@@ -1,5 +1,5 @@
 from fastapi import APIRouter
-from app.api.v1.endpoints import products, categories, users, cart, auth, reviews
+from app.api.v1.endpoints import products, categories, users, cart, orders, auth, reviews, monitoring
 
 api_router = APIRouter()
 
@@ -8,4 +8,6 @@ api_router.include_router(products.router, prefix="/products", tags=["products"]
 api_router.include_router(categories.router, prefix="/categories", tags=["categories"])
 api_router.include_router(users.router, prefix="/users", tags=["users"])
 api_router.include_router(cart.router, prefix="/cart", tags=["cart"])
-api_router.include_router(reviews.router, prefix="/reviews", tags=["reviews"]) 
\ No newline at end of file
+api_router.include_router(orders.router, prefix="/orders", tags=["orders"])
+api_router.include_router(reviews.router, prefix="/reviews", tags=["reviews"])
+api_router.include_router(monitoring.router, prefix="/monitoring", tags=["monitoring"]) 
\ No newline at end of file
@@ -2,32 +2,34 @@ from datetime import timedelta
 from typing import Any
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
-from app.core.security import create_access_token, get_password_hash, verify_password
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.security import check_password, create_access_token, hash_password
 from app.core.config import settings
+from app.core.metrics import allow_queries
 from app.api import deps
 from app.schemas.schemas import Token, UserCreate, User
 from app.models.models import User as UserModel
 
 router = APIRouter()
 
-@router.post("/register", response_model=User)
-def register_user(
+@router.post("/register", response_model=User, dependencies=[deps.query_budget(3)])
+async def register_user(
     *,
-    db: Session = Depends(deps.get_db),
+    db: AsyncSession = Depends(deps.get_db),
     user_in: UserCreate,
 ) -> Any:
     """
     Register new user.
     """
-    user = db.query(UserModel).filter(UserModel.email == user_in.email).first()
-    if user:
+    result = await db.execute(select(UserModel).where(UserModel.email == user_in.email))
+    if result.scalars().first():
         raise HTTPException(
             status_code=400,
             detail="The user with this email already exists in the system.",
         )
-    user = db.query(UserModel).filter(UserModel.username == user_in.username).first()
-    if user:
+    result = await db.execute(select(UserModel).where(UserModel.username == user_in.username))
+    if result.scalars().first():
         raise HTTPException(
             status_code=400,
             detail="The user with this username already exists in the system.",
@@ -36,34 +38,43 @@ def register_user(
     user = UserModel(
         email=user_in.email,
         username=user_in.username,
-        hashed_password=get_password_hash(user_in.password),
+        hashed_password=await hash_password(user_in.password),
         is_admin=False,
     )
     db.add(user)
-    db.commit()
-    db.refresh(user)
+    await db.commit()
     return user
 
-@router.post("/login", response_model=Token)
-def login(
-    db: Session = Depends(deps.get_db),
+@router.post("/login", response_model=Token, dependencies=[deps.query_budget(1)])
+async def login(
+    db: AsyncSession = Depends(deps.get_db),
     form_data: OAuth2PasswordRequestForm = Depends()
 ) -> Any:
     """
     OAuth2 compatible token login, get an access token for future requests.
     """
     # Try to find user by email or username
-    user = db.query(UserModel).filter(
+    result = await db.execute(select(UserModel).where(
         (UserModel.email == form_data.username) | 
         (UserModel.username == form_data.username)
-    ).first()
+    ))
+    user = result.scalars().first()
     
-    if not user or not verify_password(form_data.password, user.hashed_password):
+    verified, new_hash = (
+        await check_password(form_data.password, user.hashed_password)
+        if user else (False, None)
+    )
+    if not verified:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email/username or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
+    if new_hash:
+        # Stored hash used an outdated bcrypt cost, upgrade it transparently
+        allow_queries(1)
+        user.hashed_password = new_hash
+        await db.commit()
     access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     return {
         "access_token": create_access_token(
@@ -1,104 +1,286 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from typing import List
-from app.db.session import get_db
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import case, delete, func, literal, literal_column, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload
+from typing import Dict, List
+from app.api.deps import get_db, query_budget
 from app.models.models import Product, CartItem
-from app.schemas.schemas import CartItemCreate, CartItemResponse
+from app.schemas.schemas import (
+    CartBatchUpdate, CartCreate, CartItemCreate, CartItemResponse, CartSummary,
+)
 from app.api.deps import get_current_user
-from app.models.models import User
-from pydantic import BaseModel
+from app.schemas.schemas import User
+from pydantic import BaseModel, TypeAdapter
+from app.api.serialization import serialize
 
 router = APIRouter()
 
+cart_items_adapter = TypeAdapter(List[CartItemResponse])
+
 class UpdateQuantityRequest(BaseModel):
     quantity: int
 
-@router.get("/items", response_model=List[CartItemResponse])
-def get_cart_items(
-    db: Session = Depends(get_db),
+def cart_items_query():
+    # CartItemResponse nests product -> category, load both with the items
+    return select(CartItem).options(
+        joinedload(CartItem.product).joinedload(Product.category)
+    )
+
+async def load_cart_item(db: AsyncSession, item_id: int) -> CartItem:
+    # Called after flush and before commit so the response is built on the
+    # connection the request already holds instead of checking out another
+    result = await db.execute(
+        cart_items_query()
+        .where(CartItem.id == item_id)
+        .execution_options(populate_existing=True)
+    )
+    return result.scalars().one()
+
+async def load_cart(db: AsyncSession, user_id: int) -> List[CartItem]:
+    result = await db.execute(
+        cart_items_query()
+        .where(CartItem.user_id == user_id)
+        .execution_options(populate_existing=True)
+    )
+    return result.scalars().all()
+
+async def product_stock(db: AsyncSession, product_ids) -> Dict[int, int]:
+    """Stock of every requested product in one IN query; 404 if any is missing."""
+    result = await db.execute(
+        select(Product.id, Product.stock).where(Product.id.in_(set(product_ids)))
+    )
+    stock = dict(result.all())
+    missing = sorted(set(product_ids) - stock.keys())
+    if missing:
+        raise HTTPException(
+            status_code=404, detail=f"Product not found: {', '.join(map(str, missing))}"
+        )
+    return stock
+
+# Dialects with INSERT ... ON CONFLICT DO UPDATE ... RETURNING
+UPSERT_INSERTS = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}
+
+async def upsert_cart_items(db: AsyncSession, user_id: int, quantities: Dict[int, int]) -> Dict[int, int]:
+    """
+    Add ``quantities`` (product id -> quantity) to the user's cart in one
+    statement and return product id -> cart item id of the rows written.
+
+    New rows are inserted from a SELECT over products that only yields the
+    products with enough stock; for rows that already exist the conflict
+    update adds the quantities only while the sum stays within stock. The
+    unique (user_id, product_id) index makes this safe under concurrent adds.
+    A product missing from the result was not found or is short of stock.
+    """
+    insert = UPSERT_INSERTS[db.bind.dialect.name]
+    quantity = case(quantities, value=Product.id)
+    statement = insert(CartItem).from_select(
+        ["user_id", "product_id", "quantity"],
+        select(literal(user_id), Product.id, quantity)
+        .where(Product.id.in_(quantities), Product.stock >= quantity),
+    )
+    added = CartItem.quantity + statement.excluded.quantity
+    # Spelled out because SQLAlchemy cannot correlate a subquery of the
+    # conflict clause and would add cart_items to its FROM list instead
+    stock = (
+        select(Product.stock)
+        .where(Product.id == literal_column("excluded.product_id"))
+        .scalar_subquery()
+    )
+    statement = statement.on_conflict_do_update(
+        index_elements=[CartItem.user_id, CartItem.product_id],
+        set_={"quantity": added, "updated_at": func.now()},
+        where=added <= stock,
+    ).returning(CartItem.product_id, CartItem.id)
+    result = await db.execute(statement)
+    return dict(result.all())
+
+async def raise_upsert_error(db: AsyncSession, quantities: Dict[int, int]) -> None:
+    # Only reached when an upsert skipped a product: tell missing from short
+    await db.rollback()
+    await product_stock(db, quantities)
+    raise HTTPException(status_code=400, detail="Not enough stock")
+
+def check_quantity(quantity: int, stock: int) -> None:
+    if quantity < 1:
+        raise HTTPException(status_code=400, detail="Quantity must be at least 1")
+    if quantity > stock:
+        raise HTTPException(status_code=400, detail="Not enough stock")
+
+@router.get("/items", response_model=List[CartItemResponse], dependencies=[query_budget(2)])
+async def get_cart_items(
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    cart_items = db.query(CartItem).filter(CartItem.user_id == current_user.id).all()
-    return cart_items
+    return serialize(cart_items_adapter, await load_cart(db, current_user.id))
+
+@router.get("/summary", response_model=CartSummary, dependencies=[query_budget(2)])
+async def get_cart_summary(
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Totals of the cart for the header badge, from one aggregate query that
+    loads no rows; a line is out of stock when its quantity exceeds stock.
+    """
+    result = await db.execute(
+        select(
+            func.count(CartItem.id).label("lines"),
+            func.coalesce(func.sum(CartItem.quantity), 0).label("quantity"),
+            func.coalesce(func.sum(CartItem.quantity * Product.price), 0.0).label("total"),
+            func.count(case((CartItem.quantity > Product.stock, 1))).label("out_of_stock_lines"),
+        )
+        .select_from(CartItem)
+        .join(Product, Product.id == CartItem.product_id)
+        .where(CartItem.user_id == current_user.id)
+    )
+    return result.one()._asdict()
 
-@router.post("/items", response_model=CartItemResponse)
-def add_to_cart(
+@router.post("/items", response_model=CartItemResponse, dependencies=[query_budget(3)])
+async def add_to_cart(
     cart_item: CartItemCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    product = db.query(Product).filter(Product.id == cart_item.product_id).first()
-    if not product:
-        raise HTTPException(status_code=404, detail="Product not found")
+    if cart_item.quantity < 1:
+        raise HTTPException(status_code=400, detail="Quantity must be at least 1")
+    quantities = {cart_item.product_id: cart_item.quantity}
+    written = await upsert_cart_items(db, current_user.id, quantities)
+    if not written:
+        await raise_upsert_error(db, quantities)
+    item = await load_cart_item(db, written[cart_item.product_id])
+    await db.commit()
+    return item
 
-    if product.stock < cart_item.quantity:
-        raise HTTPException(status_code=400, detail="Not enough stock")
+# The batch routes are declared before /items/{item_id} so that "batch" is
+# not taken for an item id.
+
+@router.post("/items/batch", response_model=List[CartItemResponse], dependencies=[query_budget(3)])
+async def add_to_cart_batch(
+    cart: CartCreate,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Add several products at once (restoring a saved cart, a whole PC build).
+
+    Quantities of a product that is already in the cart, or listed more than
+    once, are summed like repeated single adds. Either every item is added or,
+    if any product is missing or short of stock, none is. Returns the whole
+    cart.
+    """
+    quantities: Dict[int, int] = {}
+    for item in cart.items:
+        if item.quantity < 1:
+            raise HTTPException(status_code=400, detail="Quantity must be at least 1")
+        quantities[item.product_id] = quantities.get(item.product_id, 0) + item.quantity
+    if not quantities:
+        return await load_cart(db, current_user.id)
+
+    written = await upsert_cart_items(db, current_user.id, quantities)
+    if len(written) != len(quantities):
+        await raise_upsert_error(db, quantities)
+    items = await load_cart(db, current_user.id)
+    await db.commit()
+    return items
+
+@router.put("/items/batch", response_model=List[CartItemResponse], dependencies=[query_budget(4)])
+async def update_cart_items_batch(
+    req: CartBatchUpdate,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Set the quantity of several cart items in one transaction; returns the whole cart."""
+    quantities = {item.id: item.quantity for item in req.items}
+    if not quantities:
+        return await load_cart(db, current_user.id)
+
+    # The items and the stock of their products in one query
+    result = await db.execute(
+        select(CartItem, Product.stock)
+        .join(Product, Product.id == CartItem.product_id)
+        .where(CartItem.id.in_(quantities), CartItem.user_id == current_user.id)
+    )
+    rows = result.all()
+    if len(rows) != len(quantities):
+        raise HTTPException(status_code=404, detail="Cart item not found")
+
+    for cart_item, stock in rows:
+        check_quantity(quantities[cart_item.id], stock)
+        cart_item.quantity = quantities[cart_item.id]
 
-    existing_item = db.query(CartItem).filter(
-        CartItem.user_id == current_user.id,
-        CartItem.product_id == cart_item.product_id
-    ).first()
-
-    if existing_item:
-        existing_item.quantity += cart_item.quantity
-        if existing_item.quantity > product.stock:
-            raise HTTPException(status_code=400, detail="Not enough stock")
-        db.commit()
-        db.refresh(existing_item)
-        return existing_item
-
-    new_cart_item = CartItem(
-        user_id=current_user.id,
-        product_id=cart_item.product_id,
-        quantity=cart_item.quantity
+    await db.flush()
+    items = await load_cart(db, current_user.id)
+    await db.commit()
+    return items
+
+@router.delete("/items/batch", response_model=List[CartItemResponse], dependencies=[query_budget(3)])
+async def remove_from_cart_batch(
+    ids: List[int] = Query(...),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Remove the cart items ``?ids=1&ids=2``; nothing is removed if any id is unknown."""
+    ids = set(ids)
+    result = await db.execute(
+        delete(CartItem)
+        .where(CartItem.id.in_(ids), CartItem.user_id == current_user.id)
+        .execution_options(synchronize_session=False)
     )
-    db.add(new_cart_item)
-    db.commit()
-    db.refresh(new_cart_item)
-    return new_cart_item
+    if result.rowcount != len(ids):
+        await db.rollback()
+        raise HTTPException(status_code=404, detail="Cart item not found")
+    items = await load_cart(db, current_user.id)
+    await db.commit()
+    return items
 
-@router.put("/items/{item_id}", response_model=CartItemResponse)
-def update_cart_item(
+@router.put("/items/{item_id}", response_model=CartItemResponse, dependencies=[query_budget(4)])
+async def update_cart_item(
     item_id: int,
     req: UpdateQuantityRequest,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     quantity = req.quantity
-    cart_item = db.query(CartItem).filter(
-        CartItem.id == item_id,
-        CartItem.user_id == current_user.id
-    ).first()
+    # The item and the stock of its product in one query
+    result = await db.execute(
+        select(CartItem, Product.stock)
+        .join(Product, Product.id == CartItem.product_id)
+        .where(CartItem.id == item_id, CartItem.user_id == current_user.id)
+    )
+    row = result.first()
 
-    if not cart_item:
+    if not row:
         raise HTTPException(status_code=404, detail="Cart item not found")
+    cart_item, stock = row
 
     if quantity < 1:
         raise HTTPException(status_code=400, detail="Quantity must be at least 1")
 
-    product = db.query(Product).filter(Product.id == cart_item.product_id).first()
-    if product.stock < quantity:
+    if stock < quantity:
         raise HTTPException(status_code=400, detail="Not enough stock")
 
     cart_item.quantity = quantity
-    db.commit()
-    db.refresh(cart_item)
-    return cart_item
+    await db.flush()
+    item = await load_cart_item(db, cart_item.id)
+    await db.commit()
+    return item
 
-@router.delete("/items/{item_id}")
-def remove_from_cart(
+@router.delete("/items/{item_id}", dependencies=[query_budget(3)])
+async def remove_from_cart(
     item_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    cart_item = db.query(CartItem).filter(
+    result = await db.execute(select(CartItem).where(
         CartItem.id == item_id,
         CartItem.user_id == current_user.id
-    ).first()
+    ))
+    cart_item = result.scalars().first()
 
     if not cart_item:
         raise HTTPException(status_code=404, detail="Cart item not found")
 
-    db.delete(cart_item)
-    db.commit()
-    return {"message": "Item removed from cart"} 
\ No newline at end of file
+    await db.delete(cart_item)
+    await db.commit()
+    return {"message": "Item removed from cart"}
@@ -1,67 +1,117 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from typing import List
-from app.db.session import get_db
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from pydantic import TypeAdapter
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
+from app.api.pagination import NEXT_CURSOR_HEADER, Keyset
+from app.api.serialization import dump_json
+from app.api.deps import get_db, query_budget
+from app.api.http_cache import (
+    cached_or_not_modified, etag_matches, last_change, make_etag, not_modified,
+    validator_headers,
+)
+from app.core.response_cache import category_tag, invalidate_category, response_cache
 from app.models.models import Category
 from app.schemas.schemas import CategoryCreate, Category as CategorySchema
 
 router = APIRouter()
 
-@router.get("/", response_model=List[CategorySchema])
-def get_categories(
+category_keyset = Keyset(Category.id)
+category_adapter = TypeAdapter(CategorySchema)
+category_list_adapter = TypeAdapter(List[CategorySchema])
+
+@router.get("/", response_model=List[CategorySchema], dependencies=[query_budget(2)])
+async def get_categories(
+    request: Request,
+    response: Response,
     skip: int = 0,
-    limit: int = 100,
-    db: Session = Depends(get_db)
+    limit: int = Query(100, ge=1),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_db)
 ):
-    return db.query(Category).offset(skip).limit(limit).all()
+    key = response_cache.key_for(request)
+    cached = response_cache.get(key)
+    if cached:
+        return cached_or_not_modified(request, cached)
+    generation = response_cache.generation
+
+    result = await db.execute(select(func.count(Category.id), last_change(Category)))
+    version = tuple(result.one())
+    headers = validator_headers(make_etag(key, version), version[1])
+    if etag_matches(request, headers["ETag"]):
+        return not_modified(headers)
+
+    query = category_keyset.apply(select(Category), cursor, limit, skip)
+    result = await db.execute(query)
+    categories = category_keyset.page(result.scalars().all(), limit, response)
 
-@router.post("/", response_model=CategorySchema)
-def create_category(
+    body = dump_json(category_list_adapter, categories)
+    if NEXT_CURSOR_HEADER in response.headers:
+        headers[NEXT_CURSOR_HEADER] = response.headers[NEXT_CURSOR_HEADER]
+    return response_cache.store(key, body, [category_tag()], generation, headers).to_response()
+
+@router.post("/", response_model=CategorySchema, dependencies=[query_budget(1)])
+async def create_category(
     category: CategoryCreate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     db_category = Category(**category.dict())
     db.add(db_category)
-    db.commit()
-    db.refresh(db_category)
+    await db.commit()
+    invalidate_category(db_category.id)
     return db_category
 
-@router.get("/{category_id}", response_model=CategorySchema)
-def get_category(
+@router.get("/{category_id}", response_model=CategorySchema, dependencies=[query_budget(1)])
+async def get_category(
+    request: Request,
     category_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    category = db.query(Category).filter(Category.id == category_id).first()
+    key = response_cache.key_for(request)
+    cached = response_cache.get(key)
+    if cached:
+        return cached_or_not_modified(request, cached)
+    generation = response_cache.generation
+
+    # A category row is tiny, load it and derive the validators from it
+    category = await db.get(Category, category_id)
     if not category:
         raise HTTPException(status_code=404, detail="Category not found")
-    return category
+    changed_at = category.updated_at or category.created_at
+    headers = validator_headers(make_etag(key, changed_at), changed_at)
+    if etag_matches(request, headers["ETag"]):
+        return not_modified(headers)
+
+    body = dump_json(category_adapter, category)
+    return response_cache.store(key, body, [category_tag(category_id)], generation, headers).to_response()
 
-@router.put("/{category_id}", response_model=CategorySchema)
-def update_category(
+@router.put("/{category_id}", response_model=CategorySchema, dependencies=[query_budget(2)])
+async def update_category(
     category_id: int,
     category: CategoryCreate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    db_category = db.query(Category).filter(Category.id == category_id).first()
+    db_category = await db.get(Category, category_id)
     if not db_category:
         raise HTTPException(status_code=404, detail="Category not found")
     
     for key, value in category.dict().items():
         setattr(db_category, key, value)
     
-    db.commit()
-    db.refresh(db_category)
+    await db.commit()
+    invalidate_category(category_id)
     return db_category
 
-@router.delete("/{category_id}")
-def delete_category(
+@router.delete("/{category_id}", dependencies=[query_budget(3)])
+async def delete_category(
     category_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    category = db.query(Category).filter(Category.id == category_id).first()
+    category = await db.get(Category, category_id)
     if not category:
         raise HTTPException(status_code=404, detail="Category not found")
     
-    db.delete(category)
-    db.commit()
-    return {"message": "Category deleted successfully"} 
\ No newline at end of file
+    await db.delete(category)
+    await db.commit()
+    invalidate_category(category_id)
+    return {"message": "Category deleted successfully"}
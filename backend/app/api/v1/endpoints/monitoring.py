@@ -0,0 +1,34 @@
+from fastapi import APIRouter, Response
+from app.core.metrics import CONTENT_TYPE, DB_POOL_CONNECTIONS, DB_POOL_WAIT_SECONDS, registry
+from app.api.deps import query_budget
+from app.db.pool import pool_status
+from app.db.session import async_engine, engine
+
+router = APIRouter()
+
+@router.get("/db-pool", dependencies=[query_budget(0)])
+async def get_db_pool_status():
+    """
+    Connection pool occupancy and checkout wait times of this worker process.
+    """
+    return {
+        "async": pool_status(async_engine.pool),
+        "sync": pool_status(engine.pool),
+    }
+
+# Mounted at the application root, where Prometheus expects it
+metrics_router = APIRouter()
+
+@metrics_router.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    """
+    Request latency, per-route DB usage and pool occupancy in Prometheus text format.
+    """
+    for name, pool in (("async", async_engine.pool), ("sync", engine.pool)):
+        status = pool_status(pool)
+        for state in ("checked_out", "checked_in", "overflow"):
+            if state in status:
+                DB_POOL_CONNECTIONS.set(status[state], engine=name, state=state)
+        if "wait_seconds_total" in status:
+            DB_POOL_WAIT_SECONDS.set(status["wait_seconds_total"], engine=name)
+    return Response(content=registry.render(), media_type=CONTENT_TYPE)
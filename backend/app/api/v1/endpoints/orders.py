@@ -0,0 +1,114 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from sqlalchemy import delete, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+from typing import Dict, List, Optional, Tuple
+from app.api.deps import get_db, get_current_user, query_budget
+from pydantic import TypeAdapter
+from app.api.pagination import Keyset
+from app.api.serialization import serialize
+from app.core.metrics import allow_queries
+from app.core.response_cache import invalidate_product
+from app.models.models import CartItem, Order, OrderItem, Product
+from app.schemas.schemas import Order as OrderSchema, User
+
+router = APIRouter()
+
+order_keyset = Keyset(Order.id, descending=True)
+order_list_adapter = TypeAdapter(List[OrderSchema])
+
+def orders_query():
+    return select(Order).options(selectinload(Order.items))
+
+async def place_order(db: AsyncSession, user_id: int) -> Tuple[Order, Dict[int, Optional[int]]]:
+    """
+    Turn the user's cart into an order inside the caller's transaction.
+
+    Stock is taken with one conditional ``UPDATE ... WHERE stock >= :q`` per
+    product, so concurrent buyers can never push it below zero, and the
+    products are updated in id order so that two checkouts locking the same
+    rows always lock them in the same order and cannot deadlock. Returns the
+    flushed order and product id -> category id of the products it touched;
+    the caller commits.
+
+    The cart is claimed first by deleting it: a second checkout of the same
+    cart (a double click) blocks on the deleted rows until this transaction
+    commits, then finds nothing left and fails with "Cart is empty" instead
+    of ordering and decrementing the stock again.
+    """
+    result = await db.execute(
+        delete(CartItem)
+        .where(CartItem.user_id == user_id)
+        .returning(CartItem.product_id, CartItem.quantity)
+    )
+    # DELETE ... RETURNING takes no ORDER BY
+    cart = sorted(result.all())
+    if not cart:
+        raise HTTPException(status_code=400, detail="Cart is empty")
+    # The route's query budget covers the fixed statements; the conditional
+    # decrement below runs once per cart line by design
+    allow_queries(len(cart))
+
+    order = Order(user_id=user_id, total=0.0)
+    categories: Dict[int, Optional[int]] = {}
+    for product_id, quantity in cart:
+        result = await db.execute(
+            update(Product)
+            .where(Product.id == product_id, Product.stock >= quantity)
+            .values(stock=Product.stock - quantity)
+            .returning(Product.price, Product.category_id)
+            .execution_options(synchronize_session=False)
+        )
+        row = result.first()
+        if row is None:
+            # The session is discarded without commit, which undoes the
+            # decrements already made
+            raise HTTPException(status_code=400, detail=f"Not enough stock: {product_id}")
+        order.items.append(OrderItem(product_id=product_id, quantity=quantity, price=row.price))
+        order.total += row.price * quantity
+        categories[product_id] = row.category_id
+
+    db.add(order)
+    await db.flush()
+    await db.refresh(order, ["created_at"])
+    return order, categories
+
+@router.post("/checkout", response_model=OrderSchema, dependencies=[query_budget(6)])
+async def checkout(
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Place an order for everything in the cart and empty the cart."""
+    order, categories = await place_order(db, current_user.id)
+    await db.commit()
+    for product_id, category_id in categories.items():
+        invalidate_product(product_id, category_id)
+    return order
+
+@router.get("/", response_model=List[OrderSchema], dependencies=[query_budget(3)])
+async def get_orders(
+    response: Response,
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """The user's orders, newest first; page with the ``X-Next-Cursor`` header."""
+    query = orders_query().where(Order.user_id == current_user.id)
+    result = await db.execute(order_keyset.apply(query, cursor, limit))
+    orders = order_keyset.page(result.scalars().all(), limit, response)
+    return serialize(order_list_adapter, orders, response.headers)
+
+@router.get("/{order_id}", response_model=OrderSchema, dependencies=[query_budget(3)])
+async def get_order(
+    order_id: int,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    result = await db.execute(
+        orders_query().where(Order.id == order_id, Order.user_id == current_user.id)
+    )
+    order = result.scalars().first()
+    if not order:
+        raise HTTPException(status_code=404, detail="Order not found")
+    return order
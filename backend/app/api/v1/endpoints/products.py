@@ -1,71 +1,429 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session, joinedload
-from typing import List
-from app.db.session import get_db
-from app.models.models import Product
-from app.schemas.schemas import ProductCreate, Product as ProductSchema
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from pydantic import TypeAdapter
+from enum import Enum
+import csv
+import io
+import orjson
+from sqlalchemy import and_, case, func, select, true
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload
+from typing import AsyncIterator, List, Optional
+from app.api.pagination import NEXT_CURSOR_HEADER, Keyset
+from app.api.serialization import dump_json, serialize
+from app.api.deps import get_db, query_budget
+from app.api.http_cache import (
+    cached_or_not_modified, etag_matches, last_change, make_etag, newest,
+    not_modified, validator_headers,
+)
+from app.core.metrics import allow_queries
+from app.db.search import fulltext_search, fuzzy_search
+from app.db.session import AsyncSessionLocal
+from app.core.response_cache import (
+    invalidate_product, product_list_tag, product_tag, response_cache,
+)
+from app.models.models import Category, Product
+from app.schemas.schemas import (
+    CategoryFacet, PriceBucketFacet, ProductCreate, ProductFacets, Product as ProductSchema,
+)
 
 router = APIRouter()
 
-@router.get("/", response_model=List[ProductSchema])
-def get_products(
-    skip: int = 0,
+product_adapter = TypeAdapter(ProductSchema)
+product_list_adapter = TypeAdapter(List[ProductSchema])
+facets_adapter = TypeAdapter(ProductFacets)
+
+class ProductSort(str, Enum):
+    id = "id"
+    price_asc = "price_asc"
+    price_desc = "price_desc"
+    rating = "rating"
+    newest = "newest"
+
+# Every sort order ends in id so the key is unique, and each one is served by
+# a (price|rating|created_at, id) index with and without a category prefix;
+# descending orders scan the same index backwards.
+PRODUCT_SORTS = {
+    ProductSort.id: Keyset(Product.id),
+    ProductSort.price_asc: Keyset(Product.price, Product.id),
+    ProductSort.price_desc: Keyset(Product.price, Product.id, descending=True),
+    ProductSort.rating: Keyset(Product.rating, Product.id, descending=True),
+    ProductSort.newest: Keyset(Product.created_at, Product.id, descending=True),
+}
+
+# Lower bounds of the price buckets reported by /products/facets
+PRICE_BUCKETS = (0.0, 10000.0, 25000.0, 50000.0, 100000.0)
+
+class ProductFilters:
+    """Listing filters shared by the product list and its facets."""
+
+    def __init__(
+        self,
+        category_id: Optional[int] = None,
+        min_price: Optional[float] = Query(None, ge=0),
+        max_price: Optional[float] = Query(None, ge=0),
+        min_rating: Optional[float] = Query(None, ge=0, le=5),
+        in_stock: bool = False,
+    ):
+        self.category_id = category_id
+        self.min_price = min_price
+        self.max_price = max_price
+        self.min_rating = min_rating
+        self.in_stock = in_stock
+
+    def price_conditions(self) -> list:
+        conditions = []
+        if self.min_price is not None:
+            conditions.append(Product.price >= self.min_price)
+        if self.max_price is not None:
+            conditions.append(Product.price <= self.max_price)
+        return conditions
+
+    def apply(self, query, category: bool = True, price: bool = True):
+        """Add the filters to ``query``; facets leave out the one they count."""
+        if category and self.category_id:
+            query = query.where(Product.category_id == self.category_id)
+        if price:
+            query = query.where(*self.price_conditions())
+        if self.min_rating is not None:
+            query = query.where(Product.rating >= self.min_rating)
+        if self.in_stock:
+            query = query.where(Product.stock > 0)
+        return query
+
+def price_bucket():
+    """Lower bound of the PRICE_BUCKETS entry a product's price falls into."""
+    whens = [(Product.price.is_(None), None)]
+    whens += [(Product.price < upper, lower) for lower, upper in zip(PRICE_BUCKETS, PRICE_BUCKETS[1:])]
+    return case(*whens, else_=PRICE_BUCKETS[-1])
+
+async def products_version(db: AsyncSession, category_id: Optional[int]):
+    """
+    Row counts and newest change of the products (and the categories they
+    embed) behind a listing: one aggregate query, no product rows loaded.
+    """
+    products = select(func.count(Product.id).label("n"), last_change(Product).label("ts"))
+    if category_id:
+        products = products.where(Product.category_id == category_id)
+    products = products.subquery()
+    categories = select(
+        func.count(Category.id).label("n"), last_change(Category).label("ts")
+    ).subquery()
+    result = await db.execute(
+        select(products.c.n, products.c.ts, categories.c.n, categories.c.ts)
+        .select_from(products.join(categories, true()))
+    )
+    return tuple(result.one())
+
+def product_list_query(
+    filters: ProductFilters,
+    sort: ProductSort,
+    cursor: Optional[str] = None,
     limit: int = 100,
-    category_id: int = None,
-    db: Session = Depends(get_db)
+    skip: int = 0,
+):
+    query = filters.apply(select(Product).options(joinedload(Product.category)))
+    return PRODUCT_SORTS[sort].apply(query, cursor, limit, skip)
+
+@router.get("/", response_model=List[ProductSchema], dependencies=[query_budget(2)])
+async def get_products(
+    request: Request,
+    response: Response,
+    skip: int = 0,
+    limit: int = Query(100, ge=1),
+    cursor: Optional[str] = None,
+    filters: ProductFilters = Depends(),
+    sort: ProductSort = ProductSort.id,
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    List products, filtered by category, price range, minimum rating and
+    stock, ordered by ``sort``.
+
+    Pass the ``X-Next-Cursor`` response header back as ``cursor`` (with the
+    same filters and sort) to fetch the next page; ``skip`` is kept for
+    offset-style clients. Responses carry an ETag and ``If-None-Match`` is
+    answered with 304.
+    """
+    key = response_cache.key_for(request)
+    cached = response_cache.get(key)
+    if cached:
+        return cached_or_not_modified(request, cached)
+    generation = response_cache.generation
+
+    # Versioned by the whole category: any change that can move a product in
+    # or out of the filtered page also changes its count or newest timestamp
+    version = await products_version(db, filters.category_id)
+    headers = validator_headers(make_etag(key, version), newest(version[1], version[3]))
+    if etag_matches(request, headers["ETag"]):
+        return not_modified(headers)
+
+    result = await db.execute(product_list_query(filters, sort, cursor, limit, skip))
+    products = PRODUCT_SORTS[sort].page(result.scalars().all(), limit, response)
+
+    body = dump_json(product_list_adapter, products)
+    if NEXT_CURSOR_HEADER in response.headers:
+        headers[NEXT_CURSOR_HEADER] = response.headers[NEXT_CURSOR_HEADER]
+    tags = [product_list_tag(filters.category_id or None)]
+    return response_cache.store(key, body, tags, generation, headers).to_response()
+
+@router.get("/facets", response_model=ProductFacets, dependencies=[query_budget(2)])
+async def get_product_facets(
+    request: Request,
+    filters: ProductFilters = Depends(),
+    db: AsyncSession = Depends(get_db)
 ):
-    query = db.query(Product).options(joinedload(Product.reviews))
+    """
+    Product counts per category and per price bucket for the given filters.
+
+    Each facet ignores its own filter (category counts apply the price range
+    but not ``category_id``, and vice versa), so a client can show how many
+    products every alternative choice would yield. Both are computed from one
+    grouped query.
+    """
+    key = response_cache.key_for(request)
+    cached = response_cache.get(key)
+    if cached:
+        return cached_or_not_modified(request, cached)
+    generation = response_cache.generation
+
+    version = await products_version(db, None)
+    headers = validator_headers(make_etag(key, version), newest(version[1], version[3]))
+    if etag_matches(request, headers["ETag"]):
+        return not_modified(headers)
+
+    # Grouping by (category, price bucket, inside the price range) is enough
+    # to derive both facets without a second pass over products
+    bucket = price_bucket().label("bucket")
+    in_price = case((and_(true(), *filters.price_conditions()), 1), else_=0).label("in_price")
+    query = filters.apply(
+        select(Product.category_id, bucket, in_price, func.count(Product.id).label("n")),
+        category=False,
+        price=False,
+    )
+    result = await db.execute(query.group_by(Product.category_id, bucket, in_price))
+
+    categories: dict = {}
+    buckets: dict = {}
+    for row in result:
+        if row.in_price:
+            categories[row.category_id] = categories.get(row.category_id, 0) + row.n
+        if row.bucket is not None and (
+            not filters.category_id or row.category_id == filters.category_id
+        ):
+            buckets[row.bucket] = buckets.get(row.bucket, 0) + row.n
+
+    upper_bounds = dict(zip(PRICE_BUCKETS, PRICE_BUCKETS[1:]))
+    facets = ProductFacets(
+        categories=[
+            CategoryFacet(category_id=c, count=n)
+            for c, n in sorted(categories.items()) if c is not None
+        ],
+        price_buckets=[
+            PriceBucketFacet(min_price=b, max_price=upper_bounds.get(b), count=buckets.get(b, 0))
+            for b in PRICE_BUCKETS
+        ],
+    )
+    body = facets_adapter.dump_json(facets)
+    return response_cache.store(key, body, [product_list_tag()], generation, headers).to_response()
+
+# Search cursors are prefixed with the mode that produced the first page
+SEARCH_MODES = {"t": fulltext_search, "f": fuzzy_search}
+
+async def search_page(
+    db: AsyncSession,
+    mode: str,
+    q: str,
+    category_id: Optional[int],
+    cursor: Optional[str],
+    limit: int,
+    response: Response,
+) -> List[Product]:
+    statement, rank = SEARCH_MODES[mode](db.bind.dialect.name, q)
+    statement = statement.options(joinedload(Product.category))
     if category_id:
-        query = query.filter(Product.category_id == category_id)
-    return query.offset(skip).limit(limit).all()
+        statement = statement.where(Product.category_id == category_id)
+    keyset = Keyset(rank, Product.id, descending=True)
+    result = await db.execute(keyset.apply(statement, cursor, limit))
+    rows = keyset.page(result.all(), limit, response, key=lambda row: (row.rank, row.Product.id))
+    if NEXT_CURSOR_HEADER in response.headers:
+        response.headers[NEXT_CURSOR_HEADER] = f"{mode}.{response.headers[NEXT_CURSOR_HEADER]}"
+    return [row.Product for row in rows]
+
+@router.get("/search", response_model=List[ProductSchema], dependencies=[query_budget(1)])
+async def search_products(
+    response: Response,
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    category_id: int = None,
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Full-text search over product names and descriptions, best match first.
+
+    When nothing matches (typically a typo) the first page falls back to
+    name similarity. Paging works like the product list: pass the
+    ``X-Next-Cursor`` header back as ``cursor``.
+    """
+    q = q.strip()
+    if not q:
+        return []
+    if cursor:
+        mode, _, cursor = cursor.partition(".")
+        if mode not in SEARCH_MODES:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        products = await search_page(db, mode, q, category_id, cursor, limit, response)
+        return serialize(product_list_adapter, products, response.headers)
+
+    products = await search_page(db, "t", q, category_id, None, limit, response)
+    if not products:
+        # The typo fallback is a second, planned query
+        allow_queries(1)
+        products = await search_page(db, "f", q, category_id, None, limit, response)
+    return serialize(product_list_adapter, products, response.headers)
 
-@router.post("/", response_model=ProductSchema)
-def create_product(
+class ExportFormat(str, Enum):
+    ndjson = "ndjson"
+    csv = "csv"
+
+EXPORT_MEDIA_TYPES = {
+    ExportFormat.ndjson: "application/x-ndjson",
+    ExportFormat.csv: "text/csv",
+}
+
+# Plain columns rather than ORM objects: nothing accumulates in a session
+# identity map, and each batch is encoded and dropped before the next fetch
+EXPORT_COLUMNS = (
+    Product.id, Product.sku, Product.name, Product.description, Product.price,
+    Product.stock, Product.category_id, Category.name.label("category"),
+    Product.image_url, Product.rating, Product.reviews_count,
+)
+EXPORT_BATCH_SIZE = 1000
+
+def encode_export_batch(rows, export_format: ExportFormat, header: bool) -> bytes:
+    if export_format is ExportFormat.ndjson:
+        return b"".join(orjson.dumps(row._asdict()) + b"\n" for row in rows)
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    if header:
+        writer.writerow(column.key for column in EXPORT_COLUMNS)
+    writer.writerows(rows)
+    return buffer.getvalue().encode()
+
+async def export_rows(filters: ProductFilters, export_format: ExportFormat) -> AsyncIterator[bytes]:
+    # The response body is produced after the handler has returned, so the
+    # export owns its session instead of borrowing the request's. The
+    # server-side cursor keeps at most EXPORT_BATCH_SIZE rows in memory.
+    statement = filters.apply(
+        select(*EXPORT_COLUMNS).outerjoin(Product.category).order_by(Product.id)
+    ).execution_options(yield_per=EXPORT_BATCH_SIZE)
+    async with AsyncSessionLocal() as db:
+        result = await db.stream(statement)
+        header = True
+        async for rows in result.partitions():
+            yield encode_export_batch(rows, export_format, header)
+            header = False
+        if header and export_format is ExportFormat.csv:
+            yield encode_export_batch([], export_format, header)
+
+@router.get("/export", dependencies=[query_budget(1)])
+async def export_products(
+    filters: ProductFilters = Depends(),
+    export_format: ExportFormat = Query(ExportFormat.ndjson, alias="format"),
+):
+    """
+    The whole catalog, or the part matching the listing filters, streamed
+    as NDJSON (one product per line) or CSV in id order. Memory use does
+    not grow with the catalog size.
+    """
+    return StreamingResponse(
+        export_rows(filters, export_format),
+        media_type=EXPORT_MEDIA_TYPES[export_format],
+        headers={"Content-Disposition": f'attachment; filename="products.{export_format.value}"'},
+    )
+
+@router.post("/", response_model=ProductSchema, dependencies=[query_budget(3)])
+async def create_product(
     product: ProductCreate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     db_product = Product(**product.dict())
     db.add(db_product)
-    db.commit()
-    db.refresh(db_product)
+    await db.flush()
+    await db.refresh(db_product, ["category"])
+    await db.commit()
+    invalidate_product(db_product.id, db_product.category_id)
     return db_product
 
-@router.get("/{product_id}", response_model=ProductSchema)
-def get_product(
+@router.get("/{product_id}", response_model=ProductSchema, dependencies=[query_budget(2)])
+async def get_product(
+    request: Request,
     product_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    product = db.query(Product).options(joinedload(Product.reviews)).filter(Product.id == product_id).first()
+    key = response_cache.key_for(request)
+    cached = response_cache.get(key)
+    if cached:
+        return cached_or_not_modified(request, cached)
+    generation = response_cache.generation
+
+    result = await db.execute(
+        select(
+            func.coalesce(Product.updated_at, Product.created_at),
+            func.coalesce(Category.updated_at, Category.created_at),
+        )
+        .outerjoin(Product.category)
+        .where(Product.id == product_id)
+    )
+    version = result.first()
+    if not version:
+        raise HTTPException(status_code=404, detail="Product not found")
+    headers = validator_headers(make_etag(key, tuple(version)), newest(*version))
+    if etag_matches(request, headers["ETag"]):
+        return not_modified(headers)
+
+    result = await db.execute(
+        select(Product).options(joinedload(Product.category)).where(Product.id == product_id)
+    )
+    product = result.scalars().first()
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
-    return product
 
-@router.put("/{product_id}", response_model=ProductSchema)
-def update_product(
+    body = dump_json(product_adapter, product)
+    tags = [product_tag(product.id), product_list_tag(product.category_id)]
+    return response_cache.store(key, body, tags, generation, headers).to_response()
+
+@router.put("/{product_id}", response_model=ProductSchema, dependencies=[query_budget(4)])
+async def update_product(
     product_id: int,
     product: ProductCreate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    db_product = db.query(Product).filter(Product.id == product_id).first()
+    db_product = await db.get(Product, product_id)
     if not db_product:
         raise HTTPException(status_code=404, detail="Product not found")
+    old_category_id = db_product.category_id
     
     for key, value in product.dict().items():
         setattr(db_product, key, value)
     
-    db.commit()
-    db.refresh(db_product)
+    await db.flush()
+    await db.refresh(db_product, ["category"])
+    await db.commit()
+    invalidate_product(product_id, old_category_id, db_product.category_id)
     return db_product
 
-@router.delete("/{product_id}")
-def delete_product(
+@router.delete("/{product_id}", dependencies=[query_budget(4)])
+async def delete_product(
     product_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    product = db.query(Product).filter(Product.id == product_id).first()
+    product = await db.get(Product, product_id)
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
     
-    db.delete(product)
-    db.commit()
-    return {"message": "Product deleted successfully"} 
\ No newline at end of file
+    await db.delete(product)
+    await db.commit()
+    invalidate_product(product_id, product.category_id)
+    return {"message": "Product deleted successfully"}
@@ -1,21 +1,73 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from sqlalchemy import Float, Numeric, cast, func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload
+from typing import List, Optional
+from pydantic import TypeAdapter
 from app.api import deps
+from app.api.pagination import Keyset
+from app.api.serialization import serialize
+from app.core.response_cache import invalidate_product
 from app.schemas import schemas
 from app.models.models import Review, Product, User
 
 router = APIRouter()
 
-@router.post("/", response_model=schemas.Review)
-def create_review(
+review_response_list_adapter = TypeAdapter(List[schemas.ReviewResponse])
+product_review_list_adapter = TypeAdapter(List[schemas.ProductReview])
+
+# Новые отзывы первыми; индекс (product_id, created_at, id) отдаёт любую
+# страницу без сортировки и OFFSET
+product_review_keyset = Keyset(Review.created_at, Review.id, descending=True)
+
+async def apply_rating_delta(db: AsyncSession, product_id: int, rating_delta: int, count_delta: int) -> int:
+    """
+    Сдвинуть агрегаты рейтинга товара на один отзыв одним UPDATE.
+
+    Средний рейтинг считает база по сохранённым сумме и количеству, поэтому
+    параллельные отзывы не затирают друг друга, а стоимость не зависит от
+    числа отзывов у товара. Возвращает категорию товара для сброса кэша.
+    """
+    rating_sum = Product.rating_sum + rating_delta
+    reviews_count = Product.reviews_count + count_delta
+    average = cast(rating_sum, Float) / func.nullif(reviews_count, 0)
+    result = await db.execute(
+        update(Product)
+        .where(Product.id == product_id)
+        .values(
+            rating_sum=rating_sum,
+            reviews_count=reviews_count,
+            rating=func.coalesce(cast(func.round(cast(average, Numeric), 1), Float), 0.0),
+        )
+        .returning(Product.category_id)
+        .execution_options(synchronize_session=False)
+    )
+    return result.scalar_one()
+
+def reviews_query():
+    # schemas.Review вкладывает пользователя и товар с категорией
+    return select(Review).options(
+        joinedload(Review.user),
+        joinedload(Review.product).joinedload(Product.category),
+    )
+
+async def load_review(db: AsyncSession, review_id: int) -> Review:
+    result = await db.execute(
+        reviews_query()
+        .where(Review.id == review_id)
+        .execution_options(populate_existing=True)
+    )
+    return result.scalars().one()
+
+@router.post("/", response_model=schemas.Review, dependencies=[deps.query_budget(6)])
+async def create_review(
     review: schemas.ReviewCreate,
-    db: Session = Depends(deps.get_db),
-    current_user: User = Depends(deps.get_current_user)
+    db: AsyncSession = Depends(deps.get_db),
+    current_user: schemas.User = Depends(deps.get_current_user)
 ):
     """Создать отзыв на товар"""
     # Проверяем, существует ли товар
-    product = db.query(Product).filter(Product.id == review.product_id).first()
+    product = await db.get(Product, review.product_id)
     if not product:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -23,10 +75,11 @@ def create_review(
         )
     
     # Проверяем, не оставлял ли пользователь уже отзыв на этот товар
-    existing_review = db.query(Review).filter(
+    result = await db.execute(select(Review.id).where(
         Review.user_id == current_user.id,
         Review.product_id == review.product_id
-    ).first()
+    ))
+    existing_review = result.first()
     
     if existing_review:
         raise HTTPException(
@@ -49,47 +102,58 @@ def create_review(
         comment=review.comment
     )
     db.add(db_review)
-    db.commit()
-    db.refresh(db_review)
-    
-    # Обновляем средний рейтинг товара
-    product_reviews = db.query(Review).filter(Review.product_id == review.product_id).all()
-    if product_reviews:
-        avg_rating = sum(r.rating for r in product_reviews) / len(product_reviews)
-        product.rating = round(avg_rating, 1)
-        db.add(product)  # Добавляем товар в сессию
-        db.commit()
-        db.refresh(product)
+    category_id = await apply_rating_delta(db, product.id, review.rating, 1)
+    await db.flush()
+    db_review = await load_review(db, db_review.id)
+    await db.commit()
+    invalidate_product(product.id, category_id)
     
     return db_review
 
-@router.get("/product/{product_id}", response_model=List[schemas.Review])
-def get_product_reviews(
+@router.get("/product/{product_id}", response_model=List[schemas.ProductReview], dependencies=[deps.query_budget(1)])
+async def get_product_reviews(
     product_id: int,
-    db: Session = Depends(deps.get_db)
+    response: Response,
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(deps.get_db)
 ):
-    """Получить все отзывы для товара"""
-    reviews = db.query(Review).filter(Review.product_id == product_id).all()
-    return reviews
+    """
+    Отзывы о товаре, новые первыми, с именем автора; следующую страницу
+    отдаёт ``cursor`` из заголовка ``X-Next-Cursor``.
+    """
+    # Только нужные столбцы и один JOIN: товар клиенту уже известен
+    query = (
+        select(Review.id, Review.rating, Review.comment, Review.created_at, User.username)
+        .join(User, User.id == Review.user_id)
+        .where(Review.product_id == product_id)
+    )
+    result = await db.execute(product_review_keyset.apply(query, cursor, limit))
+    reviews = product_review_keyset.page(result.all(), limit, response)
+    return serialize(product_review_list_adapter, reviews, response.headers)
 
-@router.get("/user/me", response_model=List[schemas.ReviewResponse])
-def get_user_reviews(
-    db: Session = Depends(deps.get_db),
-    current_user: User = Depends(deps.get_current_user)
+@router.get("/user/me", response_model=List[schemas.ReviewResponse], dependencies=[deps.query_budget(2)])
+async def get_user_reviews(
+    db: AsyncSession = Depends(deps.get_db),
+    current_user: schemas.User = Depends(deps.get_current_user)
 ):
     """Получить все отзывы текущего пользователя"""
-    reviews = db.query(Review).filter(Review.user_id == current_user.id).all()
-    return reviews
+    result = await db.execute(
+        select(Review)
+        .options(joinedload(Review.product).joinedload(Product.category))
+        .where(Review.user_id == current_user.id)
+    )
+    return serialize(review_response_list_adapter, result.scalars().all())
 
-@router.put("/{review_id}", response_model=schemas.Review)
-def update_review(
+@router.put("/{review_id}", response_model=schemas.Review, dependencies=[deps.query_budget(5)])
+async def update_review(
     review_id: int,
     review_update: schemas.ReviewBase,
-    db: Session = Depends(deps.get_db),
-    current_user: User = Depends(deps.get_current_user)
+    db: AsyncSession = Depends(deps.get_db),
+    current_user: schemas.User = Depends(deps.get_current_user)
 ):
     """Обновить отзыв"""
-    db_review = db.query(Review).filter(Review.id == review_id).first()
+    db_review = await db.get(Review, review_id)
     
     if not db_review:
         raise HTTPException(
@@ -110,32 +174,27 @@ def update_review(
             detail="Рейтинг должен быть от 1 до 5"
         )
     
-    # Обновляем отзыв
+    # Обновляем отзыв и рейтинг товара в одной транзакции
+    category_id = await apply_rating_delta(
+        db, db_review.product_id, review_update.rating - db_review.rating, 0
+    )
     db_review.rating = review_update.rating
     db_review.comment = review_update.comment
-    db.commit()
-    db.refresh(db_review)
-    
-    # Обновляем средний рейтинг товара
-    product_reviews = db.query(Review).filter(Review.product_id == db_review.product_id).all()
-    if product_reviews:
-        avg_rating = sum(r.rating for r in product_reviews) / len(product_reviews)
-        product = db.query(Product).filter(Product.id == db_review.product_id).first()
-        if product:
-            product.rating = round(avg_rating, 1)
-            db.add(product)  # Добавляем товар в сессию
-            db.commit()
+    await db.flush()
+    db_review = await load_review(db, db_review.id)
+    await db.commit()
+    invalidate_product(db_review.product_id, category_id)
     
     return db_review
 
-@router.delete("/{review_id}")
-def delete_review(
+@router.delete("/{review_id}", dependencies=[deps.query_budget(4)])
+async def delete_review(
     review_id: int,
-    db: Session = Depends(deps.get_db),
-    current_user: User = Depends(deps.get_current_user)
+    db: AsyncSession = Depends(deps.get_db),
+    current_user: schemas.User = Depends(deps.get_current_user)
 ):
     """Удалить отзыв"""
-    db_review = db.query(Review).filter(Review.id == review_id).first()
+    db_review = await db.get(Review, review_id)
     
     if not db_review:
         raise HTTPException(
@@ -149,20 +208,9 @@ def delete_review(
             detail="Недостаточно прав для удаления этого отзыва"
         )
     
-    product_id = db_review.product_id
-    db.delete(db_review)
-    db.commit()
-    
-    # Обновляем средний рейтинг товара
-    product_reviews = db.query(Review).filter(Review.product_id == product_id).all()
-    product = db.query(Product).filter(Product.id == product_id).first()
-    if product:
-        if product_reviews:
-            avg_rating = sum(r.rating for r in product_reviews) / len(product_reviews)
-            product.rating = round(avg_rating, 1)
-        else:
-            product.rating = 0.0
-        db.add(product)  # Добавляем товар в сессию
-        db.commit()
+    category_id = await apply_rating_delta(db, db_review.product_id, -db_review.rating, -1)
+    await db.delete(db_review)
+    await db.commit()
+    invalidate_product(db_review.product_id, category_id)
     
     return {"message": "Отзыв успешно удален"} 
\ No newline at end of file
@@ -1,57 +1,68 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from typing import List, Any
-from app.db.session import get_db
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Any, Optional
+from pydantic import TypeAdapter
+from app.api.pagination import Keyset
+from app.api.serialization import serialize
+from app.api.deps import get_db, query_budget
 from app.models.models import User
 from app.schemas.schemas import UserCreate, User as UserSchema
-from app.core.security import get_password_hash
+from app.core.security import hash_password
 from app.api import deps
 
 router = APIRouter()
 
-@router.post("/", response_model=UserSchema)
-def create_user(
+user_keyset = Keyset(User.id)
+user_list_adapter = TypeAdapter(List[UserSchema])
+
+@router.post("/", response_model=UserSchema, dependencies=[query_budget(2)])
+async def create_user(
     user: UserCreate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    db_user = db.query(User).filter(User.email == user.email).first()
-    if db_user:
+    result = await db.execute(select(User).where(User.email == user.email))
+    if result.scalars().first():
         raise HTTPException(status_code=400, detail="Email already registered")
     
-    hashed_password = get_password_hash(user.password)
+    hashed_password = await hash_password(user.password)
     db_user = User(
         email=user.email,
+        username=user.username,
         hashed_password=hashed_password,
-        full_name=user.full_name
     )
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    await db.commit()
     return db_user
 
-@router.get("/me", response_model=UserSchema)
-def read_user_me(
-    current_user: User = Depends(deps.get_current_user),
+@router.get("/me", response_model=UserSchema, dependencies=[query_budget(1)])
+async def read_user_me(
+    current_user: UserSchema = Depends(deps.get_current_user),
 ) -> Any:
     """
     Get current user.
     """
     return current_user
 
-@router.get("/{user_id}", response_model=UserSchema)
-def get_user(
+@router.get("/{user_id}", response_model=UserSchema, dependencies=[query_budget(1)])
+async def get_user(
     user_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    user = db.query(User).filter(User.id == user_id).first()
+    user = await db.get(User, user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     return user
 
-@router.get("/", response_model=List[UserSchema])
-def get_users(
+@router.get("/", response_model=List[UserSchema], dependencies=[query_budget(1)])
+async def get_users(
+    response: Response,
     skip: int = 0,
-    limit: int = 100,
-    db: Session = Depends(get_db)
+    limit: int = Query(100, ge=1),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_db)
 ):
-    return db.query(User).offset(skip).limit(limit).all() 
\ No newline at end of file
+    query = user_keyset.apply(select(User), cursor, limit, skip)
+    result = await db.execute(query)
+    users = user_keyset.page(result.scalars().all(), limit, response)
+    return serialize(user_list_adapter, users, response.headers)
@@ -16,11 +16,46 @@ class Settings(BaseSettings):
     def get_database_url(self) -> str:
         return f"postgresql://{self.POSTGRES_USER}:{self.POSTGRES_PASSWORD}@{self.POSTGRES_SERVER}/{self.POSTGRES_DB}"
 
+    @property
+    def get_async_database_url(self) -> str:
+        return f"postgresql+asyncpg://{self.POSTGRES_USER}:{self.POSTGRES_PASSWORD}@{self.POSTGRES_SERVER}/{self.POSTGRES_DB}"
+
+    # Connection pool, applied to each engine in every worker process
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: float = 30.0  # seconds to wait for a free connection
+    DB_POOL_RECYCLE: int = 1800  # seconds; -1 keeps connections forever
+    DB_POOL_PRE_PING: bool = True  # drop connections killed by a failover
+    DB_STATEMENT_TIMEOUT_MS: int = 30000  # 0 disables the server-side timeout
+
+    # Rendered catalog GET responses, per worker process; 0 disables
+    RESPONSE_CACHE_MAX_BYTES: int = 64 * 1024 * 1024
+    RESPONSE_CACHE_TTL_SECONDS: float = 300.0
+
+    # Encode list responses with pydantic-core and the rest with orjson
+    FAST_JSON: bool = False
+
+    # Per-route query budgets (deps.query_budget): "off", "log" or "raise".
+    # Use "raise" in development and tests to catch N+1 regressions
+    QUERY_BUDGET_MODE: str = "off"
+
     # JWT settings
     SECRET_KEY: str = "your-secret-key-here"  # В продакшене используйте безопасный ключ
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
 
+    # Password hashing; hashes with a different cost are upgraded on login
+    BCRYPT_ROUNDS: int = 12
+    PASSWORD_HASH_WORKERS: int = 2  # processes in the hashing pool
+    PASSWORD_HASH_MAX_PENDING: int = 32  # queued + running before answering 503
+
+    # Verified bearer tokens, each kept until its own exp; 0 disables
+    TOKEN_CACHE_SIZE: int = 10000
+
+    # Resolved users of authenticated requests, per worker process; 0 disables
+    USER_CACHE_SIZE: int = 10000
+    USER_CACHE_TTL_SECONDS: float = 60.0
+
     class Config:
         case_sensitive = True
 
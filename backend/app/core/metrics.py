@@ -0,0 +1,282 @@
+"""
+In-process Prometheus metrics.
+
+A minimal registry of counters, gauges and histograms rendered in the
+Prometheus text exposition format, plus the two producers feeding it:
+``MetricsMiddleware`` times every request by route template and status, and
+``instrument_engine`` hooks SQLAlchemy cursor events so that the queries a
+request runs, and the time spent in them, are attributed to its route.
+
+Values are per worker process; Prometheus sums them across workers.
+
+Routes may also declare a query budget (``app.api.deps.query_budget``);
+``QUERY_BUDGET_MODE`` decides whether exceeding it is logged or raised.
+"""
+import logging
+import threading
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Starlette appends the charset to text/* media types
+CONTENT_TYPE = "text/plain; version=0.0.4"
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{n}="{_escape(str(v))}"' for n, v in zip(names, values)) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        return tuple(str(labels[n]) for n in self.label_names)
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        super().__init__(name, documentation, labels)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def render(self) -> List[str]:
+        with self._lock:
+            values = sorted(self._values.items())
+        lines = super().render()
+        for key, value in values:
+            lines.append(f"{self.name}{_format_labels(self.label_names, key)} {_format_value(value)}")
+        return lines
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labels: Sequence[str] = (),
+        buckets: Iterable[float] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        # label values -> (per-bucket counts, sum)
+        self._values: Dict[LabelValues, Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            counts, total = self._values.setdefault(key, ([0] * len(self.buckets), [0.0]))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            total[0] += value
+
+    def render(self) -> List[str]:
+        with self._lock:
+            values = sorted((k, (list(c), s[0])) for k, (c, s) in self._values.items())
+        lines = super().render()
+        names = self.label_names + ("le",)
+        for key, (counts, total) in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                labels = _format_labels(names, key + (_format_value(bound),))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.label_names, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class Registry:
+    def __init__(self) -> None:
+        self._metrics: List[_Metric] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+REQUEST_DURATION = registry.register(Histogram(
+    "http_request_duration_seconds",
+    "Time to serve a request, by route template and status code.",
+    ("method", "route", "status"),
+))
+REQUEST_DB_QUERIES = registry.register(Counter(
+    "http_request_db_queries_total",
+    "Database statements executed while serving requests of a route.",
+    ("method", "route"),
+))
+REQUEST_DB_SECONDS = registry.register(Counter(
+    "http_request_db_seconds_total",
+    "Time spent in database statements while serving requests of a route.",
+    ("method", "route"),
+))
+DB_QUERY_DURATION = registry.register(Histogram(
+    "db_query_duration_seconds",
+    "Duration of single database statements, inside requests or not.",
+))
+DB_POOL_CONNECTIONS = registry.register(Gauge(
+    "db_pool_connections",
+    "Connections of an engine's pool by state, sampled at scrape time.",
+    ("engine", "state"),
+))
+DB_POOL_WAIT_SECONDS = registry.register(Gauge(
+    "db_pool_wait_seconds_total",
+    "Time requests spent waiting for a pooled connection.",
+    ("engine",),
+))
+
+
+class QueryBudgetExceeded(RuntimeError):
+    pass
+
+
+@dataclass
+class RequestStats:
+    queries: int = 0
+    db_seconds: float = 0.0
+    budget: Optional[int] = None  # declared by the route, see query_budget
+
+    @property
+    def over_budget(self) -> bool:
+        return self.budget is not None and self.queries > self.budget
+
+
+# Set by MetricsMiddleware for the duration of a request. The object is
+# mutated in place, so statements run in tasks or greenlets that inherited
+# the context still count towards the request.
+current_request: ContextVar[Optional[RequestStats]] = ContextVar("current_request", default=None)
+
+
+def allow_queries(count: int) -> None:
+    """Raise the current request's budget by ``count`` planned, data-dependent statements."""
+    stats = current_request.get()
+    if stats is not None and stats.budget is not None:
+        stats.budget += count
+
+
+def instrument_engine(engine: Engine) -> None:
+    """Time every statement of ``engine`` (the sync_engine of an async one)."""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _start(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _stop(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_started"].pop()
+        DB_QUERY_DURATION.observe(elapsed)
+        stats = current_request.get()
+        if stats is not None:
+            stats.queries += 1
+            stats.db_seconds += elapsed
+            if stats.over_budget and settings.QUERY_BUDGET_MODE == "raise":
+                # Raised from the offending statement, so the traceback shows
+                # which loop or lazy load went over
+                raise QueryBudgetExceeded(
+                    f"Query {stats.queries} exceeds the route's budget of {stats.budget}: {statement}"
+                )
+
+    @event.listens_for(engine, "handle_error")
+    def _failed(context):
+        # after_cursor_execute is skipped for statements that raise
+        started = context.connection.info.get("query_started") if context.connection else None
+        if started:
+            started.pop()
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording latency and DB usage per route template."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = current_request.set(stats)
+        status = 500
+        started = time.perf_counter()
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - started
+            current_request.reset(token)
+            # The router stores the matched route in the scope; unmatched
+            # paths share one label so that scanners cannot explode the series
+            route = getattr(scope.get("route"), "path", "unmatched")
+            method = scope["method"]
+            REQUEST_DURATION.observe(elapsed, method=method, route=route, status=str(status))
+            REQUEST_DB_QUERIES.inc(stats.queries, method=method, route=route)
+            REQUEST_DB_SECONDS.inc(stats.db_seconds, method=method, route=route)
+            if stats.over_budget and settings.QUERY_BUDGET_MODE == "log":
+                logger.warning(
+                    "%s %s ran %d queries, budget %d", method, route, stats.queries, stats.budget
+                )
@@ -0,0 +1,155 @@
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Iterable, Mapping, Optional, Set, Tuple
+from urllib.parse import urlencode
+from fastapi import Request, Response
+from app.core.config import settings
+
+
+@dataclass
+class CachedResponse:
+    body: bytes
+    headers: Dict[str, str]
+    tags: Tuple[str, ...]
+    expires_at: float
+
+    @property
+    def size(self) -> int:
+        return len(self.body)
+
+    def to_response(self) -> Response:
+        return Response(content=self.body, media_type="application/json", headers=self.headers)
+
+
+class ResponseCache:
+    """
+    LRU of rendered JSON response bodies, bounded by their total size.
+
+    Every entry carries tags naming the rows it was built from; writers call
+    ``invalidate`` with the tags they touched after committing. A reader
+    records ``generation`` before querying and ``store`` refuses to cache a
+    body if any of its tags was invalidated in the meantime, so a response
+    rendered from pre-commit data can never be cached after the write.
+    """
+
+    def __init__(self, max_bytes: int, ttl: float):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, CachedResponse]" = OrderedDict()
+        self._keys_by_tag: Dict[str, Set[str]] = {}
+        self._invalidated_at: Dict[str, int] = {}
+        self._generation = 0
+        self._size = 0
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0 and self.ttl > 0
+
+    @property
+    def generation(self) -> int:
+        return self._generation
+
+    @staticmethod
+    def key_for(request: Request) -> str:
+        query = urlencode(sorted(request.query_params.multi_items()))
+        return f"{request.url.path}?{query}"
+
+    def get(self, key: str) -> Optional[CachedResponse]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry.expires_at <= time.monotonic():
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def store(
+        self,
+        key: str,
+        body: bytes,
+        tags: Iterable[str],
+        generation: int,
+        headers: Optional[Mapping[str, str]] = None,
+    ) -> CachedResponse:
+        entry = CachedResponse(
+            body=body,
+            headers=dict(headers or {}),
+            tags=tuple(tags),
+            expires_at=time.monotonic() + self.ttl,
+        )
+        if not self.enabled or entry.size > self.max_bytes:
+            return entry
+        with self._lock:
+            if any(self._invalidated_at.get(tag, -1) >= generation for tag in entry.tags):
+                return entry
+            self._remove(key)
+            self._entries[key] = entry
+            self._size += entry.size
+            for tag in entry.tags:
+                self._keys_by_tag.setdefault(tag, set()).add(key)
+            while self._size > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+        return entry
+
+    def invalidate(self, *tags: str) -> None:
+        with self._lock:
+            for tag in tags:
+                self._invalidated_at[tag] = self._generation
+                for key in list(self._keys_by_tag.get(tag, ())):
+                    self._remove(key)
+            self._generation += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._keys_by_tag.clear()
+            self._size = 0
+            self._generation += 1
+
+    def _remove(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        self._size -= entry.size
+        for tag in entry.tags:
+            keys = self._keys_by_tag.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._keys_by_tag[tag]
+
+
+# Rendered catalog responses of this worker process. Invalidation is local, so
+# RESPONSE_CACHE_TTL_SECONDS bounds how stale another worker's copy can be.
+response_cache = ResponseCache(settings.RESPONSE_CACHE_MAX_BYTES, settings.RESPONSE_CACHE_TTL_SECONDS)
+
+
+# Tags of catalog responses. Product lists are tagged by the category filter
+# they were rendered for, product pages by product and category, since every
+# product embeds its category.
+
+def product_tag(product_id: int) -> str:
+    return f"product:{product_id}"
+
+def product_list_tag(category_id: Optional[int] = None) -> str:
+    return "products:all" if category_id is None else f"products:category:{category_id}"
+
+def category_tag(category_id: Optional[int] = None) -> str:
+    return "categories" if category_id is None else f"category:{category_id}"
+
+def invalidate_product(product_id: int, *category_ids: Optional[int]) -> None:
+    """Drop everything that may show the product: its page and every list it can appear in."""
+    tags = {product_tag(product_id), product_list_tag()}
+    tags.update(product_list_tag(c) for c in category_ids if c is not None)
+    response_cache.invalidate(*tags)
+
+def invalidate_category(category_id: int) -> None:
+    response_cache.invalidate(
+        category_tag(), category_tag(category_id),
+        product_list_tag(), product_list_tag(category_id),
+    )
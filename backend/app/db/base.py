@@ -1,10 +1,124 @@
+import hashlib
+from typing import Optional
+from sqlalchemy import Float, Numeric, case, cast, delete, func, inspect, or_, select, text, update
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.schema import CreateColumn, CreateIndex, CreateTable
 from app.db.base_class import Base
-from app.models.models import User, Category, Product, CartItem
+from app.models.models import User, Category, Product, CartItem, Order, OrderItem, Review
 from app.db.session import engine
+from app.db.search import SEARCH_DDL, create_search_schema
 
 # Import all models here that should be included in the database
 # This is used by Alembic for migrations
 
-# Create all tables
-def create_tables():
-    Base.metadata.create_all(bind=engine) 
\ No newline at end of file
+# Create all tables (on the application database unless bind is given)
+def create_tables(bind: Optional[Engine] = None):
+    bind = bind or engine
+    Base.metadata.create_all(bind=bind)
+    add_missing_columns(bind)
+    merge_duplicate_cart_items(bind)
+    create_missing_indexes(bind)
+    with bind.begin() as conn:
+        create_search_schema(conn)
+
+def schema_version(bind: Optional[Engine] = None) -> str:
+    """Digest of the DDL create_tables() would emit; it reruns when this changes."""
+    dialect = (bind or engine).dialect
+    parts = []
+    for table in Base.metadata.sorted_tables:
+        parts.append(str(CreateTable(table).compile(dialect=dialect)))
+        for index in sorted(table.indexes, key=lambda i: i.name):
+            parts.append(str(CreateIndex(index).compile(dialect=dialect)))
+    parts.extend(SEARCH_DDL.get(dialect.name, []))
+    return hashlib.sha1("\n".join(parts).encode()).hexdigest()
+
+def add_missing_columns(bind: Engine):
+    # create_all() never alters an existing table, so columns added to a
+    # model later are appended here (they must be nullable or have a
+    # server default)
+    with bind.begin() as conn:
+        inspector = inspect(conn)
+        added = set()
+        for table in Base.metadata.sorted_tables:
+            existing = {c["name"] for c in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in existing:
+                    ddl = CreateColumn(column).compile(dialect=conn.dialect)
+                    conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {ddl}"))
+                    added.add(column)
+        # The review aggregates are only ever shifted by one review, so they
+        # must start from the real totals rather than the server default of 0;
+        # same transaction, so no worker can see the columns unfilled
+        if added & {Product.__table__.c.reviews_count, Product.__table__.c.rating_sum}:
+            reconcile_review_stats(conn)
+
+def reconcile_review_stats(conn: Connection) -> int:
+    """
+    Recompute Product.reviews_count, rating_sum and rating from the reviews
+    table in a single UPDATE. Safe to re-run; only drifted rows are written.
+    Returns the number of products corrected.
+    """
+    review_count = (
+        select(func.count(Review.id))
+        .where(Review.product_id == Product.id)
+        .scalar_subquery()
+    )
+    rating_sum = (
+        select(func.coalesce(func.sum(Review.rating), 0))
+        .where(Review.product_id == Product.id)
+        .scalar_subquery()
+    )
+    average = cast(rating_sum, Float) / func.nullif(review_count, 0)
+    # Products without reviews keep whatever rating they were seeded with
+    rating = case(
+        (review_count > 0, cast(func.round(cast(average, Numeric), 1), Float)),
+        else_=Product.rating,
+    )
+    result = conn.execute(
+        update(Product)
+        .where(or_(
+            Product.reviews_count != review_count,
+            Product.rating_sum != rating_sum,
+            Product.rating != rating,
+        ))
+        .values(reviews_count=review_count, rating_sum=rating_sum, rating=rating)
+    )
+    return result.rowcount
+
+def create_missing_indexes(bind: Engine):
+    # create_all() only emits indexes together with a new table, so indexes
+    # added to an existing model have to be created separately
+    with bind.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            for index in table.indexes:
+                index.create(bind=conn, checkfirst=True)
+
+def merge_duplicate_cart_items(bind: Engine):
+    # Carts filled before uq_cart_items_user_id_product_id existed may hold
+    # several rows per product; fold them into the oldest one so that the
+    # unique index can be built
+    with bind.begin() as conn:
+        indexes = {i["name"] for i in inspect(conn).get_indexes(CartItem.__tablename__)}
+        if "uq_cart_items_user_id_product_id" in indexes:
+            return
+        duplicates = conn.execute(
+            select(
+                func.min(CartItem.id).label("keep_id"),
+                CartItem.user_id,
+                CartItem.product_id,
+                func.sum(CartItem.quantity).label("quantity"),
+            )
+            .group_by(CartItem.user_id, CartItem.product_id)
+            .having(func.count() > 1)
+        ).all()
+        for row in duplicates:
+            conn.execute(
+                update(CartItem).where(CartItem.id == row.keep_id).values(quantity=row.quantity)
+            )
+            conn.execute(
+                delete(CartItem).where(
+                    CartItem.user_id == row.user_id,
+                    CartItem.product_id == row.product_id,
+                    CartItem.id != row.keep_id,
+                )
+            )
@@ -1,136 +1,219 @@
-from sqlalchemy.orm import Session
+import hashlib
+import json
+import logging
+from sqlalchemy import bindparam, delete, inspect, insert, select, text, update
+from sqlalchemy.engine import Connection
+from app.db.base import create_tables, schema_version
 from app.db.base_class import Base
-from app.db.session import engine
-from app.models.models import Category, Product, User, CartItem
+from app.db.session import create_maintenance_engine, engine
+from app.models.models import AppMeta, Category, Product, User
 from app.core.security import get_password_hash
-import logging
-from sqlalchemy import text
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Key of the PostgreSQL advisory lock held while a worker migrates and seeds
+BOOTSTRAP_LOCK_ID = 72_410_020
+
+ADMINS = [
+    {"email": "admin@admin.com", "username": "admin", "password": "admin"},
+    {"email": "admin2@admin.com", "username": "admin2", "password": "admin"},
+]
+
+CATEGORIES = [
+    {"name": "Процессоры", "description": "Центральные процессоры для компьютеров"},
+    {"name": "Видеокарты", "description": "Графические процессоры для игр и работы"},
+    {"name": "Материнские платы", "description": "Основные платы для сборки компьютера"},
+    {"name": "Оперативная память", "description": "Модули памяти для компьютера"},
+    {"name": "Накопители", "description": "SSD и HDD накопители"},
+]
+
+PRODUCTS = [
+    {
+        "name": "Intel Core i7-12700K",
+        "description": "12-ядерный процессор Intel Core i7",
+        "price": 35000.0,
+        "stock": 10,
+        "category": "Процессоры",
+        "image_url": "https://avatars.mds.yandex.net/get-goods_pic/11398227/hat4b8ccb2d7a3d9309d943b5d728a41086/600x600"
+    },
+    {
+        "name": "AMD Ryzen 9 5950X",
+        "description": "16-ядерный процессор AMD Ryzen 9",
+        "price": 45000.0,
+        "stock": 8,
+        "category": "Процессоры",
+        "image_url": "https://img.4gamers.com.tw/ckfinder-th/files/amd%20ryzen%209%205950x/11.jpg?versionId=LHGs0f_wrOW93Vjq6fMQ5E9wZHwzpbJk"
+    },
+    {
+        "name": "NVIDIA GeForce RTX 3080",
+        "description": "Видеокарта NVIDIA RTX 3080",
+        "price": 80000.0,
+        "stock": 5,
+        "category": "Видеокарты",
+        "image_url": "https://cdn.mos.cms.futurecdn.net/oskwAZyTdiJF9wQCYsV9Uh.jpg"
+    },
+    {
+        "name": "AMD Radeon RX 6800 XT",
+        "description": "Видеокарта AMD Radeon RX 6800 XT",
+        "price": 75000.0,
+        "stock": 6,
+        "category": "Видеокарты",
+        "image_url": "https://avatars.mds.yandex.net/get-mpic/5221251/img_id1665110708982750673.jpeg/orig"
+    },
+    {
+        "name": "ASUS ROG STRIX B550-F",
+        "description": "Материнская плата ASUS ROG STRIX",
+        "price": 20000.0,
+        "stock": 15,
+        "category": "Материнские платы",
+        "image_url": "https://avatars.mds.yandex.net/get-goods_pic/6240941/hat8dae8d9a25a2b7f64cf6527bdce33e66/600x600"
+    },
+    {
+        "name": "G.Skill Trident Z RGB",
+        "description": "Оперативная память G.Skill 32GB",
+        "price": 15000.0,
+        "stock": 20,
+        "category": "Оперативная память",
+        "image_url": "https://avatars.mds.yandex.net/get-mpic/1724439/img_id1689354946857813081.jpeg/optimize"
+    },
+    {
+        "name": "Samsung 970 EVO Plus",
+        "description": "SSD накопитель Samsung 1TB",
+        "price": 12000.0,
+        "stock": 25,
+        "category": "Накопители",
+        "image_url": "https://avatars.mds.yandex.net/i?id=3d4ebd19cf764d69c718098cd42d50c8_l-5452219-images-thumbs&n=13"
+    }
+]
+
+
+def seed_version() -> str:
+    """Digest of the seed data above; seeding reruns whenever it changes."""
+    payload = json.dumps([ADMINS, CATEGORIES, PRODUCTS], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha1(payload.encode()).hexdigest()
+
 def init_db() -> None:
     logger.info("Creating database tables...")
     Base.metadata.create_all(bind=engine)
     logger.info("Database tables created successfully")
 
-def create_initial_data(db: Session) -> None:
-    logger.info("Creating initial data...")
-    
-    # Create admin users if they don't exist
-    admin1 = db.query(User).filter(User.email == "admin@admin.com").first()
-    if not admin1:
-        admin1 = User(
-            email="admin@admin.com",
-            username="admin",
-            hashed_password=get_password_hash("admin"),
-            is_admin=True
-        )
-        db.add(admin1)
-        db.commit()
-        logger.info("Created admin user 1")
-
-    admin2 = db.query(User).filter(User.email == "admin2@admin.com").first()
-    if not admin2:
-        admin2 = User(
-            email="admin2@admin.com",
-            username="admin2",
-            hashed_password=get_password_hash("admin"),
-            is_admin=True
-        )
-        db.add(admin2)
-        db.commit()
-        logger.info("Created admin user 2")
-
-    # Create categories if they don't exist
-    categories = [
-        {"name": "Процессоры", "description": "Центральные процессоры для компьютеров"},
-        {"name": "Видеокарты", "description": "Графические процессоры для игр и работы"},
-        {"name": "Материнские платы", "description": "Основные платы для сборки компьютера"},
-        {"name": "Оперативная память", "description": "Модули памяти для компьютера"},
-        {"name": "Накопители", "description": "SSD и HDD накопители"},
-    ]
+def stored_versions(conn: Connection) -> dict:
+    if not inspect(conn).has_table(AppMeta.__tablename__):
+        return {}
+    return dict(conn.execute(select(AppMeta.key, AppMeta.value)).all())
 
-    for cat_data in categories:
-        category = db.query(Category).filter(Category.name == cat_data["name"]).first()
-        if not category:
-            category = Category(**cat_data)
-            db.add(category)
-            db.commit()
-            logger.info(f"Created category: {cat_data['name']}")
+def store_versions(conn: Connection, versions: dict) -> None:
+    conn.execute(delete(AppMeta).where(AppMeta.key.in_(versions)))
+    conn.execute(insert(AppMeta), [{"key": k, "value": v} for k, v in versions.items()])
 
-    # Create products if they don't exist
-    products = [
-        {
-            "name": "Intel Core i7-12700K",
-            "description": "12-ядерный процессор Intel Core i7",
-            "price": 35000.0,
-            "stock": 10,
-            "category_id": 1,
-            "image_url": "https://avatars.mds.yandex.net/get-goods_pic/11398227/hat4b8ccb2d7a3d9309d943b5d728a41086/600x600"
-        },
-        {
-            "name": "AMD Ryzen 9 5950X",
-            "description": "16-ядерный процессор AMD Ryzen 9",
-            "price": 45000.0,
-            "stock": 8,
-            "category_id": 1,
-            "image_url": "https://img.4gamers.com.tw/ckfinder-th/files/amd%20ryzen%209%205950x/11.jpg?versionId=LHGs0f_wrOW93Vjq6fMQ5E9wZHwzpbJk"
-        },
-        {
-            "name": "NVIDIA GeForce RTX 3080",
-            "description": "Видеокарта NVIDIA RTX 3080",
-            "price": 80000.0,
-            "stock": 5,
-            "category_id": 2,
-            "image_url": "https://cdn.mos.cms.futurecdn.net/oskwAZyTdiJF9wQCYsV9Uh.jpg"
-        },
-        {
-            "name": "AMD Radeon RX 6800 XT",
-            "description": "Видеокарта AMD Radeon RX 6800 XT",
-            "price": 75000.0,
-            "stock": 6,
-            "category_id": 2,
-            "image_url": "https://avatars.mds.yandex.net/get-mpic/5221251/img_id1665110708982750673.jpeg/orig"
-        },
-        {
-            "name": "ASUS ROG STRIX B550-F",
-            "description": "Материнская плата ASUS ROG STRIX",
-            "price": 20000.0,
-            "stock": 15,
-            "category_id": 3,
-            "image_url": "https://avatars.mds.yandex.net/get-goods_pic/6240941/hat8dae8d9a25a2b7f64cf6527bdce33e66/600x600"
-        },
-        {
-            "name": "G.Skill Trident Z RGB",
-            "description": "Оперативная память G.Skill 32GB",
-            "price": 15000.0,
-            "stock": 20,
-            "category_id": 4,
-            "image_url": "https://avatars.mds.yandex.net/get-mpic/1724439/img_id1689354946857813081.jpeg/optimize"
-        },
+def bootstrap_database() -> None:
+    """
+    Bring the schema and seed data up to date, once per deployment.
+
+    Every worker runs this on startup. The usual case is a single read of
+    app_meta showing that both versions match, and nothing else happens.
+    Otherwise the first worker takes an advisory lock and migrates and
+    seeds; the others wait for the lock, find the versions current and
+    return.
+    """
+    wanted = {"schema_version": schema_version(), "seed_version": seed_version()}
+    with engine.connect() as conn:
+        if stored_versions(conn) == wanted:
+            return
+
+    # Waiting for the lock and rewriting or indexing a large table can both
+    # outlast the request statement timeout of the application engine
+    maintenance = create_maintenance_engine()
+    try:
+        with maintenance.connect() as lock:
+            if lock.dialect.name == "postgresql":
+                lock.execute(text("SELECT pg_advisory_lock(:id)"), {"id": BOOTSTRAP_LOCK_ID})
+                lock.commit()
+            try:
+                with maintenance.connect() as conn:
+                    current = stored_versions(conn)
+                if current.get("schema_version") != wanted["schema_version"]:
+                    logger.info("Updating database schema...")
+                    create_tables(maintenance)
+                if current.get("seed_version") != wanted["seed_version"]:
+                    with maintenance.begin() as conn:
+                        create_initial_data(conn)
+                        store_versions(conn, wanted)
+                elif current != wanted:
+                    with maintenance.begin() as conn:
+                        store_versions(conn, wanted)
+            finally:
+                if lock.dialect.name == "postgresql":
+                    lock.execute(text("SELECT pg_advisory_unlock(:id)"), {"id": BOOTSTRAP_LOCK_ID})
+                    lock.commit()
+    finally:
+        maintenance.dispose()
+
+def create_initial_data(conn: Connection) -> None:
+    """
+    Upsert the seed data in bulk inside the caller's transaction.
+
+    Missing admins, categories and products are inserted; existing
+    categories and products are matched by name and get the seeded
+    descriptions, prices and images. Stock is only set when a product is
+    created, so reseeding does not undo sales.
+    """
+    logger.info("Creating initial data...")
+
+    existing = set(conn.execute(
+        select(User.email).where(User.email.in_([a["email"] for a in ADMINS]))
+    ).scalars())
+    admins = [
         {
-            "name": "Samsung 970 EVO Plus",
-            "description": "SSD накопитель Samsung 1TB",
-            "price": 12000.0,
-            "stock": 25,
-            "category_id": 5,
-            "image_url": "https://avatars.mds.yandex.net/i?id=3d4ebd19cf764d69c718098cd42d50c8_l-5452219-images-thumbs&n=13"
+            "email": a["email"],
+            "username": a["username"],
+            "hashed_password": get_password_hash(a["password"]),
+            "is_admin": True,
         }
+        for a in ADMINS if a["email"] not in existing
     ]
+    if admins:
+        conn.execute(insert(User), admins)
+        logger.info(f"Created {len(admins)} admin users")
 
-    for prod_data in products:
-        product = db.query(Product).filter(Product.name == prod_data["name"]).first()
-        if not product:
-            product = Product(**prod_data)
-            db.add(product)
-            db.commit()
-            logger.info(f"Created product: {prod_data['name']}")
-        else:
-            # Update existing product with new data
-            for key, value in prod_data.items():
-                setattr(product, key, value)
-            db.commit()
-            logger.info(f"Updated product: {prod_data['name']}")
-
-    logger.info("Initial data creation completed") 
\ No newline at end of file
+    categories = dict(conn.execute(
+        select(Category.name, Category.id).where(Category.name.in_([c["name"] for c in CATEGORIES]))
+    ).all())
+    new_categories = [c for c in CATEGORIES if c["name"] not in categories]
+    if new_categories:
+        conn.execute(insert(Category), new_categories)
+    if categories:
+        conn.execute(
+            update(Category).where(Category.id == bindparam("category_id")),
+            [
+                {"category_id": categories[c["name"]], "description": c["description"]}
+                for c in CATEGORIES if c["name"] in categories
+            ],
+        )
+    categories = dict(conn.execute(
+        select(Category.name, Category.id).where(Category.name.in_([c["name"] for c in CATEGORIES]))
+    ).all())
+
+    products = dict(conn.execute(
+        select(Product.name, Product.id).where(Product.name.in_([p["name"] for p in PRODUCTS]))
+    ).all())
+    rows = [
+        {**{k: v for k, v in p.items() if k != "category"}, "category_id": categories[p["category"]]}
+        for p in PRODUCTS
+    ]
+    new_products = [{**r, "rating": 0.0} for r in rows if r["name"] not in products]
+    if new_products:
+        conn.execute(insert(Product), new_products)
+    if products:
+        conn.execute(
+            update(Product).where(Product.id == bindparam("product_id")),
+            [
+                {"product_id": products[r["name"]], **{k: v for k, v in r.items() if k not in ("name", "stock")}}
+                for r in rows if r["name"] in products
+            ],
+        )
+    logger.info(
+        f"Seeded {len(new_categories)} new categories, {len(new_products)} new products, "
+        f"updated {len(products)} products"
+    )
@@ -0,0 +1,70 @@
+import threading
+import time
+from typing import Any, Dict
+from sqlalchemy import exc
+from sqlalchemy.pool import AsyncAdaptedQueuePool, Pool, QueuePool
+
+
+class PoolMetrics:
+    """Counters for how long callers waited to check a connection out."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.wait_count = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+        self.timeouts = 0
+
+    def record_wait(self, seconds: float, timed_out: bool) -> None:
+        with self._lock:
+            self.wait_count += 1
+            self.wait_seconds_total += seconds
+            self.wait_seconds_max = max(self.wait_seconds_max, seconds)
+            if timed_out:
+                self.timeouts += 1
+
+
+class _WaitTimingMixin:
+    # Kept on the class: engine.dispose() replaces the pool instance
+    metrics: PoolMetrics
+
+    def _do_get(self) -> Any:
+        started = time.perf_counter()
+        timed_out = False
+        try:
+            return super()._do_get()  # type: ignore[misc]
+        except exc.TimeoutError:
+            timed_out = True
+            raise
+        finally:
+            self.metrics.record_wait(time.perf_counter() - started, timed_out)
+
+
+class SyncEnginePool(_WaitTimingMixin, QueuePool):
+    metrics = PoolMetrics()
+
+
+class AsyncEnginePool(_WaitTimingMixin, AsyncAdaptedQueuePool):
+    metrics = PoolMetrics()
+
+
+def pool_status(pool: Pool) -> Dict[str, Any]:
+    """Live occupancy of a queue pool plus its accumulated wait statistics."""
+    status: Dict[str, Any] = {"pool": type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        status.update(
+            size=pool.size(),
+            checked_out=pool.checkedout(),
+            checked_in=pool.checkedin(),
+            # QueuePool reports unopened base slots as negative overflow
+            overflow=max(pool.overflow(), 0),
+        )
+    metrics = getattr(pool, "metrics", None)
+    if metrics is not None:
+        status.update(
+            wait_count=metrics.wait_count,
+            wait_seconds_total=round(metrics.wait_seconds_total, 6),
+            wait_seconds_max=round(metrics.wait_seconds_max, 6),
+            timeouts=metrics.timeouts,
+        )
+    return status
@@ -0,0 +1,114 @@
+"""
+Full-text product search.
+
+On PostgreSQL ``products.search_vector`` is a stored generated ``tsvector``
+over name (weight A) and description (weight B) using the ``russian`` text
+search configuration, with a GIN index. Typos that match nothing fall back to
+``pg_trgm`` similarity on the name, backed by a trigram GIN index.
+
+SQLite has neither, so for local runs and benchmarks an FTS5 external-content
+table ``products_fts`` kept in sync by triggers stands in for the tsvector
+(ranked with ``bm25``) and ``LIKE`` stands in for trigram matching. Both
+backends are created idempotently by ``create_search_schema``.
+"""
+from typing import Any, Tuple
+from sqlalchemy import Float, Select, cast, column, func, inspect, literal_column, select, table, text
+from sqlalchemy.engine import Connection
+from app.models.models import Product
+
+TEXT_SEARCH_CONFIG = "russian"
+
+products_fts = table("products_fts", column("rowid"))
+
+_POSTGRES_DDL = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    f"""
+    ALTER TABLE products ADD COLUMN IF NOT EXISTS search_vector tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('{TEXT_SEARCH_CONFIG}', coalesce(name, '')), 'A') ||
+        setweight(to_tsvector('{TEXT_SEARCH_CONFIG}', coalesce(description, '')), 'B')
+    ) STORED
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_products_search_vector ON products USING gin (search_vector)",
+    "CREATE INDEX IF NOT EXISTS ix_products_name_trgm ON products USING gin (name gin_trgm_ops)",
+]
+
+_SQLITE_DDL = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS products_fts
+    USING fts5(name, description, content='products', content_rowid='id')
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS products_fts_ai AFTER INSERT ON products BEGIN
+        INSERT INTO products_fts(rowid, name, description)
+        VALUES (new.id, new.name, new.description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS products_fts_ad AFTER DELETE ON products BEGIN
+        INSERT INTO products_fts(products_fts, rowid, name, description)
+        VALUES ('delete', old.id, old.name, old.description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS products_fts_au AFTER UPDATE ON products BEGIN
+        INSERT INTO products_fts(products_fts, rowid, name, description)
+        VALUES ('delete', old.id, old.name, old.description);
+        INSERT INTO products_fts(rowid, name, description)
+        VALUES (new.id, new.name, new.description);
+    END
+    """,
+]
+
+
+SEARCH_DDL = {"postgresql": _POSTGRES_DDL, "sqlite": _SQLITE_DDL}
+
+
+def create_search_schema(conn: Connection) -> None:
+    if conn.dialect.name == "postgresql":
+        for ddl in SEARCH_DDL["postgresql"]:
+            conn.execute(text(ddl))
+    elif conn.dialect.name == "sqlite":
+        is_new = not inspect(conn).has_table("products_fts")
+        for ddl in SEARCH_DDL["sqlite"]:
+            conn.execute(text(ddl))
+        if is_new:
+            # Index the rows that existed before the triggers did
+            conn.execute(text("INSERT INTO products_fts(products_fts) VALUES ('rebuild')"))
+
+
+def fulltext_search(dialect: str, q: str) -> Tuple[Select, Any]:
+    """
+    Select ``(Product, rank)`` for products matching ``q`` and return the
+    rank expression with it; a higher rank is a better match.
+    """
+    if dialect == "postgresql":
+        vector = literal_column("products.search_vector")
+        query = func.websearch_to_tsquery(TEXT_SEARCH_CONFIG, q)
+        rank = func.ts_rank(vector, query, type_=Float)
+        return select(Product, rank.label("rank")).where(vector.op("@@")(query)), rank
+    fts = literal_column("products_fts")
+    rank = -func.bm25(fts, type_=Float)
+    statement = (
+        select(Product, rank.label("rank"))
+        .join(products_fts, products_fts.c.rowid == Product.id)
+        .where(fts.op("MATCH")(_fts5_query(q)))
+    )
+    return statement, rank
+
+
+def fuzzy_search(dialect: str, q: str) -> Tuple[Select, Any]:
+    """Like ``fulltext_search``, but matches names resembling ``q`` (typos)."""
+    if dialect == "postgresql":
+        rank = func.similarity(Product.name, q, type_=Float)
+        # `%` is pg_trgm's similarity operator and can use the trigram index
+        return select(Product, rank.label("rank")).where(Product.name.op("%")(q)), rank
+    rank = cast(func.length(q), Float) / func.length(Product.name)
+    return select(Product, rank.label("rank")).where(Product.name.contains(q, autoescape=True)), rank
+
+
+def _fts5_query(q: str) -> str:
+    # Quote every term so user input cannot use FTS5 query syntax; the
+    # trailing * keeps prefix matching close to the stemmed tsvector search
+    terms = [t.replace('"', '""') for t in q.split()]
+    return " ".join(f'"{t}"*' for t in terms if t)
@@ -1,13 +1,57 @@
+from typing import Any, Dict, Optional
 from sqlalchemy import create_engine
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
 from app.core.config import settings
+from app.core.metrics import instrument_engine
+from app.db.pool import AsyncEnginePool, SyncEnginePool
 
-engine = create_engine(settings.get_database_url)
+def engine_options(is_async: bool) -> Dict[str, Any]:
+    options: Dict[str, Any] = {
+        "poolclass": AsyncEnginePool if is_async else SyncEnginePool,
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+    }
+    timeout = settings.DB_STATEMENT_TIMEOUT_MS
+    if timeout:
+        # asyncpg and psycopg2 take session settings in different shapes
+        if is_async:
+            options["connect_args"] = {"server_settings": {"statement_timeout": str(timeout)}}
+        else:
+            options["connect_args"] = {"options": f"-c statement_timeout={timeout}"}
+    return options
+
+def create_maintenance_engine(database_url: Optional[str] = None) -> Engine:
+    """
+    A throwaway engine for migrations and bulk loads, which can legitimately
+    run (or wait on a lock) longer than DB_STATEMENT_TIMEOUT_MS allows a
+    request. No pool and no timeout; dispose of it when done.
+    """
+    url = make_url(database_url or settings.get_database_url)
+    connect_args: Dict[str, Any] = {}
+    if url.get_backend_name() == "postgresql" and url.get_driver_name() == "psycopg2":
+        # Explicitly off, overriding a role or database default as well
+        connect_args["options"] = "-c statement_timeout=0"
+    return create_engine(url, poolclass=NullPool, connect_args=connect_args)
+
+# Synchronous engine for startup tasks and scripts (scripts/add_components.py)
+engine = create_engine(settings.get_database_url, **engine_options(is_async=False))
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close() 
\ No newline at end of file
+# Async engine serving the request path. Objects stay usable after commit so
+# handlers can build the response without implicit (blocking) reloads.
+async_engine = create_async_engine(
+    settings.get_async_database_url, **engine_options(is_async=True)
+)
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine, autoflush=False, expire_on_commit=False
+)
+
+# Query count and DB time per request, exported at /metrics
+instrument_engine(engine)
+instrument_engine(async_engine.sync_engine)
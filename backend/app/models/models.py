@@ -1,8 +1,15 @@
-from sqlalchemy import Column, Integer, String, Float, ForeignKey, DateTime, Boolean, Text
+from sqlalchemy import Column, Integer, String, Float, ForeignKey, DateTime, Boolean, Text, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.db.base_class import Base
 
+class AppMeta(Base):
+    """Key/value facts about the database itself, such as the seeded version."""
+    __tablename__ = "app_meta"
+
+    key = Column(String, primary_key=True)
+    value = Column(String, nullable=False)
+
 class User(Base):
     __tablename__ = "users"
 
@@ -17,11 +24,14 @@ class User(Base):
 
     cart_items = relationship("CartItem", back_populates="user")
     reviews = relationship("Review", back_populates="user")
+    orders = relationship("Order", back_populates="user")
 
 class Product(Base):
     __tablename__ = "products"
 
     id = Column(Integer, primary_key=True, index=True)
+    # Supplier article number; catalog imports upsert on it
+    sku = Column(String, unique=True, index=True, nullable=True)
     name = Column(String, index=True)
     description = Column(Text)
     price = Column(Float)
@@ -29,6 +39,10 @@ class Product(Base):
     category_id = Column(Integer, ForeignKey("categories.id"))
     image_url = Column(String, nullable=True)
     rating = Column(Float, default=0.0)
+    # Denormalized so listings never have to load review rows to count them;
+    # rating is derived from rating_sum / reviews_count on every review write
+    reviews_count = Column(Integer, nullable=False, default=0, server_default="0")
+    rating_sum = Column(Integer, nullable=False, default=0, server_default="0")
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
@@ -36,9 +50,18 @@ class Product(Base):
     cart_items = relationship("CartItem", back_populates="product")
     reviews = relationship("Review", back_populates="product")
 
-    @property
-    def reviews_count(self):
-        return len(self.reviews)
+    __table_args__ = (
+        # Keyset pagination of a single category: WHERE category_id = ? AND id > ?
+        Index("ix_products_category_id_id", "category_id", "id"),
+        # One index per listing sort order, with and without the category
+        # filter; descending sorts scan them backwards
+        Index("ix_products_price_id", "price", "id"),
+        Index("ix_products_category_id_price_id", "category_id", "price", "id"),
+        Index("ix_products_rating_id", "rating", "id"),
+        Index("ix_products_category_id_rating_id", "category_id", "rating", "id"),
+        Index("ix_products_created_at_id", "created_at", "id"),
+        Index("ix_products_category_id_created_at_id", "category_id", "created_at", "id"),
+    )
 
 class Category(Base):
     __tablename__ = "categories"
@@ -46,6 +69,8 @@ class Category(Base):
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, unique=True, index=True)
     description = Column(Text)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     products = relationship("Product", back_populates="category")
 
 class CartItem(Base):
@@ -61,6 +86,11 @@ class CartItem(Base):
     user = relationship("User", back_populates="cart_items")
     product = relationship("Product", back_populates="cart_items")
 
+    __table_args__ = (
+        # One row per product in a cart; adding again upserts into it
+        Index("uq_cart_items_user_id_product_id", "user_id", "product_id", unique=True),
+    )
+
 class Review(Base):
     __tablename__ = "reviews"
 
@@ -73,4 +103,39 @@ class Review(Base):
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
     user = relationship("User", back_populates="reviews")
-    product = relationship("Product", back_populates="reviews") 
\ No newline at end of file
+    product = relationship("Product", back_populates="reviews")
+
+    __table_args__ = (
+        # A product's reviews, newest first: WHERE product_id = ? AND (created_at, id) < (?, ?)
+        Index("ix_reviews_product_id_created_at_id", "product_id", "created_at", "id"),
+    )
+
+class Order(Base):
+    __tablename__ = "orders"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    status = Column(String, nullable=False, default="placed")
+    total = Column(Float, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+
+    user = relationship("User", back_populates="orders")
+    items = relationship("OrderItem", back_populates="order", order_by="OrderItem.id")
+
+    __table_args__ = (
+        # A user's order history, newest first: WHERE user_id = ? AND id < ?
+        Index("ix_orders_user_id_id", "user_id", "id"),
+    )
+
+class OrderItem(Base):
+    __tablename__ = "order_items"
+
+    id = Column(Integer, primary_key=True, index=True)
+    order_id = Column(Integer, ForeignKey("orders.id"), nullable=False, index=True)
+    product_id = Column(Integer, ForeignKey("products.id"), nullable=False)
+    quantity = Column(Integer, nullable=False)
+    price = Column(Float, nullable=False)  # unit price at checkout
+
+    order = relationship("Order", back_populates="items")
+    product = relationship("Product")
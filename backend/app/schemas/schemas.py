@@ -57,6 +57,19 @@ class Product(ProductBase):
     class Config:
         from_attributes = True
 
+class CategoryFacet(BaseModel):
+    category_id: int
+    count: int
+
+class PriceBucketFacet(BaseModel):
+    min_price: float
+    max_price: Optional[float] = None
+    count: int
+
+class ProductFacets(BaseModel):
+    categories: List[CategoryFacet]
+    price_buckets: List[PriceBucketFacet]
+
 class CartItemBase(BaseModel):
     product_id: int
     quantity: int
@@ -86,6 +99,39 @@ class Cart(CartBase):
     class Config:
         from_attributes = True
 
+class CartSummary(BaseModel):
+    lines: int
+    quantity: int
+    total: float
+    out_of_stock_lines: int
+
+class CartItemQuantity(BaseModel):
+    id: int
+    quantity: int
+
+class CartBatchUpdate(BaseModel):
+    items: List[CartItemQuantity]
+
+class OrderItem(BaseModel):
+    id: int
+    product_id: int
+    quantity: int
+    price: float
+
+    class Config:
+        from_attributes = True
+
+class Order(BaseModel):
+    id: int
+    user_id: int
+    status: str
+    total: float
+    created_at: datetime
+    items: List[OrderItem]
+
+    class Config:
+        from_attributes = True
+
 class ReviewBase(BaseModel):
     rating: int
     comment: str
@@ -104,6 +150,17 @@ class Review(ReviewBase):
     class Config:
         from_attributes = True
 
+class ProductReview(BaseModel):
+    """A review as listed under its product, which the client already has."""
+    id: int
+    rating: int
+    comment: str
+    created_at: datetime
+    username: str
+
+    class Config:
+        from_attributes = True
+
 class ReviewResponse(BaseModel):
     id: int
     rating: int
@@ -2,14 +2,18 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.core.config import settings
 from app.api.v1.api import api_router
-from app.db.init_db import create_initial_data
-from app.db.session import SessionLocal
-from app.db.base import create_tables
+from app.api.v1.endpoints.monitoring import metrics_router
+from app.db.init_db import bootstrap_database
+from app.db.session import async_engine
+from app.core.security import shutdown_hash_pool
+from app.api.serialization import default_response_class
+from app.core.metrics import MetricsMiddleware
 
 app = FastAPI(
     title=settings.PROJECT_NAME,
     version=settings.VERSION,
-    openapi_url=f"{settings.API_V1_STR}/openapi.json"
+    openapi_url=f"{settings.API_V1_STR}/openapi.json",
+    default_response_class=default_response_class(),
 )
 
 # Configure CORS
@@ -21,20 +25,21 @@ app.add_middleware(
     allow_headers=["*"],  # Allows all headers
     expose_headers=["*"]
 )
+# Outermost, so that latency includes CORS handling
+app.add_middleware(MetricsMiddleware)
 
 app.include_router(api_router, prefix=settings.API_V1_STR)
+app.include_router(metrics_router)
 
 @app.on_event("startup")
 async def startup_event():
-    # Create tables
-    create_tables()
-    
-    # Initialize data
-    db = SessionLocal()
-    try:
-        create_initial_data(db)
-    finally:
-        db.close()
+    # Migrate and seed if this deployment changed the schema or seed data
+    bootstrap_database()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    shutdown_hash_pool()
+    await async_engine.dispose()
 
 if __name__ == "__main__":
     import uvicorn
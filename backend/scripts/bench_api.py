@@ -0,0 +1,355 @@
+"""
+Throughput and latency of the hot API endpoints, driven in-process.
+
+The FastAPI app is called through httpx's ASGI transport, so the numbers
+cover routing, dependencies, validation, queries and serialization, without
+sockets or a server in between. A synthetic catalog is seeded first: popular
+categories hold most products, and popular products get most reviews and
+cart lines (Zipf-like, see --skew). Every scenario then runs --requests
+requests with --concurrency in flight:
+
+    login           POST /auth/login (dominated by bcrypt, see BCRYPT_ROUNDS)
+    product_list    GET  /products/ by category and sort order
+    product_detail  GET  /products/{id}
+    cart_add        POST /cart/items
+    cart_list       GET  /cart/items
+    review_create   POST /reviews/
+
+Results are written as JSON (--output), keyed by the current commit, and can
+be compared with an earlier run:
+
+    python scripts/bench_api.py                      # application database
+    python scripts/bench_api.py --database-url sqlite:///bench.db
+    python scripts/bench_api.py --compare bench-api-1a2b3c4.json
+
+Needs the development requirements (pip install -r requirements-dev.txt).
+
+Use a scratch database: the script adds its own categories, products, users,
+reviews and cart lines. Without a reachable PostgreSQL it falls back to a
+temporary SQLite file, which serializes writers; compare runs on the same
+database only. The response and user caches are live, as in production.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import logging
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from typing import Dict, List, Optional
+
+# Add the parent directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+from sqlalchemy import bindparam, create_engine, insert, update
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from app.api.deps import get_db
+from app.api.v1.endpoints.products import ProductSort
+from app.core.config import settings
+from app.core.security import get_password_hash, shutdown_hash_pool
+from app.db.base import create_tables
+from app.models.models import CartItem, Category, Product, Review, User
+from main import app
+
+PASSWORD = "bench-password"
+ASYNC_DRIVERS = {"postgresql": "postgresql+asyncpg", "sqlite": "sqlite+aiosqlite"}
+
+# The app configures INFO logging; one line per benchmark request drowns the results
+logging.getLogger("httpx").setLevel(logging.WARNING)
+
+class Catalog:
+    """Seeded ids plus the skewed pickers the scenarios draw from."""
+
+    def __init__(self, rng: random.Random, skew: float):
+        self.rng = rng
+        self.skew = skew
+        self.category_ids: List[int] = []
+        self.product_ids: List[int] = []
+        self.users: List[Dict] = []
+        self.reviewed = set()
+        self._weights = {}
+
+    def popular(self, ids: List[int], k: int = 1) -> List[int]:
+        # The first ids are the most popular: weight 1 / rank ** skew
+        if len(ids) not in self._weights:
+            self._weights[len(ids)] = list(itertools.accumulate(
+                1 / (rank + 1) ** self.skew for rank in range(len(ids))
+            ))
+        return self.rng.choices(ids, cum_weights=self._weights[len(ids)], k=k)
+
+def seed(engine, args) -> Catalog:
+    rng = random.Random(args.random_seed)
+    catalog = Catalog(rng, args.skew)
+    run = uuid.uuid4().hex[:8]
+    hashed_password = get_password_hash(PASSWORD)
+    with engine.begin() as conn:
+        catalog.category_ids = conn.execute(
+            insert(Category).returning(Category.id, sort_by_parameter_order=True),
+            [{"name": f"Bench {run} {i}", "description": "Синтетическая категория"}
+             for i in range(args.categories)],
+        ).scalars().all()
+        category_of = catalog.popular(catalog.category_ids, args.products)
+        catalog.product_ids = conn.execute(
+            insert(Product).returning(Product.id, sort_by_parameter_order=True),
+            [
+                {"sku": f"BENCH-{run}-{i}", "name": f"Товар {run} {i}",
+                 "description": "Описание синтетического товара. " * rng.randint(2, 20),
+                 "price": round(rng.lognormvariate(8, 1.2), 2), "stock": 1_000_000,
+                 "category_id": category_of[i], "image_url": f"/images/bench/{i}.jpg"}
+                for i in range(args.products)
+            ],
+        ).scalars().all()
+        user_rows = [
+            {"email": f"bench{i}-{run}@example.com", "username": f"bench{i}-{run}",
+             "hashed_password": hashed_password}
+            for i in range(args.users)
+        ]
+        user_ids = conn.execute(
+            insert(User).returning(User.id, sort_by_parameter_order=True), user_rows
+        ).scalars().all()
+        catalog.users = [dict(row, id=user_id) for row, user_id in zip(user_rows, user_ids)]
+
+        def pairs(count: int):
+            # Distinct (user, product) pairs, products drawn by popularity
+            seen = set()
+            attempts = count * 20
+            while len(seen) < count and attempts:
+                attempts -= 1
+                seen.add((rng.choice(user_ids), catalog.popular(catalog.product_ids)[0]))
+            return seen
+
+        catalog.reviewed = pairs(args.reviews)
+        stats: Dict[int, List[int]] = {}
+        reviews = []
+        for user_id, product_id in catalog.reviewed:
+            rating = rng.choices((1, 2, 3, 4, 5), weights=(1, 1, 2, 4, 6))[0]
+            reviews.append({"user_id": user_id, "product_id": product_id, "rating": rating,
+                            "comment": "Синтетический отзыв. " * rng.randint(1, 10)})
+            stats.setdefault(product_id, [0, 0])
+            stats[product_id][0] += rating
+            stats[product_id][1] += 1
+        if reviews:
+            conn.execute(insert(Review), reviews)
+        # Keep the denormalized aggregates consistent with the seeded reviews
+        if stats:
+            conn.execute(
+                update(Product.__table__).where(Product.id == bindparam("product_id")).values(
+                    rating_sum=bindparam("rating_sum"), reviews_count=bindparam("count"),
+                    rating=bindparam("average"),
+                ),
+                [{"product_id": product_id, "rating_sum": rating_sum, "count": count,
+                  "average": round(rating_sum / count, 1)}
+                 for product_id, (rating_sum, count) in stats.items()],
+            )
+        cart = pairs(args.cart_lines)
+        if cart:
+            conn.execute(insert(CartItem), [
+                {"user_id": user_id, "product_id": product_id, "quantity": rng.randint(1, 3)}
+                for user_id, product_id in cart
+            ])
+    return catalog
+
+async def run_scenario(client: httpx.AsyncClient, make_request, requests: int, concurrency: int):
+    latencies: List[float] = []
+    errors: Dict[int, int] = {}
+    pending = iter(range(requests))
+
+    async def worker():
+        for _ in pending:
+            started = time.perf_counter()
+            response = await make_request(client)
+            latencies.append(time.perf_counter() - started)
+            if response.status_code >= 400:
+                errors[response.status_code] = errors.get(response.status_code, 0) + 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "requests": requests,
+        "errors": {str(code): count for code, count in sorted(errors.items())},
+        "rps": round(requests / elapsed, 1),
+        "mean_ms": round(sum(latencies) / len(latencies) * 1000, 3),
+        "p50_ms": round(latencies[len(latencies) // 2] * 1000, 3),
+        "p99_ms": round(latencies[min(int(len(latencies) * 0.99), len(latencies) - 1)] * 1000, 3),
+    }
+
+def scenarios(catalog: Catalog, tokens: List[Dict[str, str]]):
+    rng = catalog.rng
+    sorts = [sort.value for sort in ProductSort]
+    api = settings.API_V1_STR
+
+    def session():
+        index = rng.randrange(len(tokens))
+        return catalog.users[index], tokens[index]
+
+    async def login(client):
+        user = rng.choice(catalog.users)
+        return await client.post(f"{api}/auth/login", data={"username": user["email"], "password": PASSWORD})
+
+    async def product_list(client):
+        params = {"limit": 20, "sort": rng.choice(sorts)}
+        if rng.random() < 0.7:
+            params["category_id"] = catalog.popular(catalog.category_ids)[0]
+        return await client.get(f"{api}/products/", params=params)
+
+    async def product_detail(client):
+        return await client.get(f"{api}/products/{catalog.popular(catalog.product_ids)[0]}")
+
+    async def cart_add(client):
+        _, headers = session()
+        product_id = catalog.popular(catalog.product_ids)[0]
+        return await client.post(f"{api}/cart/items", json={"product_id": product_id, "quantity": 1}, headers=headers)
+
+    async def cart_list(client):
+        _, headers = session()
+        return await client.get(f"{api}/cart/items", headers=headers)
+
+    async def review_create(client):
+        user, headers = session()
+        for _ in range(100):
+            product_id = catalog.popular(catalog.product_ids)[0]
+            if (user["id"], product_id) not in catalog.reviewed:
+                break
+        catalog.reviewed.add((user["id"], product_id))
+        return await client.post(
+            f"{api}/reviews/", headers=headers,
+            json={"product_id": product_id, "rating": rng.randint(1, 5), "comment": "Отзыв из бенчмарка"},
+        )
+
+    return {
+        "login": login,
+        "product_list": product_list,
+        "product_detail": product_detail,
+        "cart_add": cart_add,
+        "cart_list": cart_list,
+        "review_create": review_create,
+    }
+
+def resolve_database(url: Optional[str]):
+    """Sync engine for seeding plus the async URL the app will use."""
+    if url:
+        engine = create_engine(url)
+    else:
+        engine = create_engine(settings.get_database_url)
+        try:
+            engine.connect().close()
+        except OperationalError:
+            path = os.path.join(tempfile.mkdtemp(prefix="bench-api-"), "bench.db")
+            print(f"PostgreSQL at {settings.POSTGRES_SERVER} is unreachable, using SQLite {path}")
+            engine = create_engine(f"sqlite:///{path}")
+    backend = engine.url.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        sys.exit(f"Unsupported database: {backend}")
+    return engine, engine.url.set(drivername=ASYNC_DRIVERS[backend])
+
+def current_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def compare(results: Dict, baseline_path: str) -> None:
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    print(f"\ncompared with {baseline_path} ({baseline.get('commit')})")
+    for name, current in results["scenarios"].items():
+        before = baseline["scenarios"].get(name)
+        if not before:
+            continue
+        changes = "  ".join(
+            f"{key} {(current[key] - before[key]) / before[key] * 100:+.1f}%"
+            for key in ("rps", "p50_ms", "p99_ms") if before[key]
+        )
+        print(f"  {name:<16}{changes}")
+
+async def run(args, engine, async_url) -> Dict:
+    catalog = seed(engine, args)
+    bench_engine = create_async_engine(
+        async_url,
+        **({} if async_url.get_backend_name() == "sqlite"
+           else {"pool_size": args.concurrency, "max_overflow": 0}),
+    )
+    sessions = async_sessionmaker(bind=bench_engine, autoflush=False, expire_on_commit=False)
+
+    async def bench_db():
+        async with sessions() as db:
+            yield db
+
+    app.dependency_overrides[get_db] = bench_db
+    transport = httpx.ASGITransport(app=app)
+    results = {
+        "commit": current_commit(),
+        "database": async_url.get_backend_name(),
+        "parameters": {key: value for key, value in vars(args).items()
+                       if key not in ("database_url", "output", "compare")},
+        "scenarios": {},
+    }
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            tokens = []
+            for user in catalog.users[:args.sessions]:
+                response = await client.post(
+                    f"{settings.API_V1_STR}/auth/login",
+                    data={"username": user["email"], "password": PASSWORD},
+                )
+                tokens.append({"Authorization": f"Bearer {response.json()['access_token']}"})
+            catalog.users = catalog.users[:len(tokens)]
+
+            print(f"{'scenario':<16}{'rps':>10}{'p50 ms':>10}{'p99 ms':>10}  errors")
+            for name, make_request in scenarios(catalog, tokens).items():
+                requests = args.login_requests if name == "login" else args.requests
+                await run_scenario(client, make_request, min(requests, 10), 1)  # warm up
+                result = await run_scenario(client, make_request, requests, args.concurrency)
+                results["scenarios"][name] = result
+                print(f"{name:<16}{result['rps']:>10}{result['p50_ms']:>10}{result['p99_ms']:>10}  "
+                      f"{result['errors'] or ''}")
+    finally:
+        app.dependency_overrides.pop(get_db, None)
+        await bench_engine.dispose()
+        shutdown_hash_pool()
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--database-url", help="sync URL; defaults to the application database, "
+                                               "or a temporary SQLite file if it is unreachable")
+    parser.add_argument("--categories", type=int, default=20)
+    parser.add_argument("--products", type=int, default=5000)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--reviews", type=int, default=20000)
+    parser.add_argument("--cart-lines", type=int, default=5000)
+    parser.add_argument("--skew", type=float, default=1.1, help="Zipf exponent of popularity")
+    parser.add_argument("--sessions", type=int, default=50, help="logged-in users making requests")
+    parser.add_argument("--requests", type=int, default=500, help="requests per scenario")
+    parser.add_argument("--login-requests", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=10, help="requests in flight")
+    parser.add_argument("--random-seed", type=int, default=42)
+    parser.add_argument("--output", help="JSON results file, default bench-api-<commit>.json")
+    parser.add_argument("--compare", help="earlier JSON results to compare with")
+    args = parser.parse_args()
+
+    engine, async_url = resolve_database(args.database_url)
+    create_tables(engine)
+
+    results = asyncio.run(run(args, engine, async_url))
+    output = args.output or f"bench-api-{results['commit'] or 'local'}.json"
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2, ensure_ascii=False)
+    print(f"\nwritten to {output}")
+    if args.compare:
+        compare(results, args.compare)
+
+if __name__ == "__main__":
+    main()
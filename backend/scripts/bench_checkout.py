@@ -0,0 +1,114 @@
+"""
+Checkout throughput on a single hot product with many parallel buyers.
+
+Every buyer gets a fresh user with the hot product in the cart; all of them
+then check out at once through the same place_order() the endpoint runs, each
+in its own session and transaction. The run reports orders per second and
+verifies that concurrent decrements neither oversold nor lost a sale: with
+more buyers than stock, exactly ``--stock`` units are sold and none is left.
+
+    python scripts/bench_checkout.py --database-url postgresql+asyncpg://...
+    python scripts/bench_checkout.py --buyers 2000 --stock 500 --concurrency 100
+
+Use a scratch database: the script creates its own users, product and
+orders. SQLite serializes writers, so only PostgreSQL numbers are meaningful.
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+import uuid
+
+# Add the parent directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi import HTTPException
+from sqlalchemy import func, insert, make_url, select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from app.api.v1.endpoints.orders import place_order
+from app.core.config import settings
+from app.db.base_class import Base
+from app.models.models import CartItem, Category, OrderItem, Product, User
+
+async def seed(engine, buyers: int, stock: int):
+    run = uuid.uuid4().hex[:8]
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        category_id = (await conn.execute(
+            insert(Category).values(name=f"bench-{run}", description="bench").returning(Category.id)
+        )).scalar_one()
+        product_id = (await conn.execute(
+            insert(Product).values(
+                name=f"Hot SKU {run}", description="bench", price=1000.0,
+                stock=stock, category_id=category_id,
+            ).returning(Product.id)
+        )).scalar_one()
+        user_ids = (await conn.execute(
+            insert(User).returning(User.id),
+            [
+                {"email": f"buyer{i}-{run}@bench", "username": f"buyer{i}-{run}", "hashed_password": "x"}
+                for i in range(buyers)
+            ],
+        )).scalars().all()
+        await conn.execute(insert(CartItem), [
+            {"user_id": user_id, "product_id": product_id, "quantity": 1} for user_id in user_ids
+        ])
+    return product_id, user_ids
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--database-url", default=settings.get_async_database_url)
+    parser.add_argument("--buyers", type=int, default=1000)
+    parser.add_argument("--stock", type=int, default=300)
+    parser.add_argument("--concurrency", type=int, default=50, help="checkouts in flight")
+    args = parser.parse_args()
+
+    pool = {}
+    if make_url(args.database_url).get_backend_name() != "sqlite":
+        pool = {"pool_size": args.concurrency, "max_overflow": 0, "pool_timeout": 120}
+    engine = create_async_engine(args.database_url, **pool)
+    sessions = async_sessionmaker(bind=engine, expire_on_commit=False)
+    product_id, user_ids = await seed(engine, args.buyers, args.stock)
+
+    gate = asyncio.Semaphore(args.concurrency)
+    outcomes = {"ordered": 0, "sold_out": 0}
+    latencies = []
+
+    async def buy(user_id: int):
+        async with gate, sessions() as db:
+            started = time.perf_counter()
+            try:
+                await place_order(db, user_id)
+                await db.commit()
+                outcomes["ordered"] += 1
+            except HTTPException:
+                await db.rollback()
+                outcomes["sold_out"] += 1
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(buy(user_id) for user_id in user_ids))
+    elapsed = time.perf_counter() - started
+
+    async with sessions() as db:
+        stock_left = await db.scalar(select(Product.stock).where(Product.id == product_id))
+        sold = await db.scalar(
+            select(func.coalesce(func.sum(OrderItem.quantity), 0)).where(OrderItem.product_id == product_id)
+        )
+    await engine.dispose()
+
+    latencies.sort()
+    print(f"buyers {args.buyers}, stock {args.stock}, concurrency {args.concurrency}")
+    print(f"checkouts: {outcomes['ordered']} ordered, {outcomes['sold_out']} sold out in {elapsed:.2f}s")
+    print(f"throughput: {len(user_ids) / elapsed:.0f} checkouts/s, {outcomes['ordered'] / elapsed:.0f} orders/s")
+    print(f"latency: p50 {latencies[len(latencies) // 2] * 1000:.1f} ms, "
+          f"p99 {latencies[int(len(latencies) * 0.99)] * 1000:.1f} ms")
+    print(f"sold {sold}, stock left {stock_left}")
+    expected = min(args.stock, args.buyers)
+    if sold != expected or stock_left != args.stock - expected:
+        print("OVERSOLD or lost orders")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,82 @@
+"""
+Compare what a product list page pulls from the database before and after
+reviews_count became a column.
+
+The "before" statement is the old listing query (joinedload of every review
+just to call len() on them), the "after" statement is the current one. Both
+are executed as plain SQL so the numbers are rows and decoded bytes actually
+returned by the driver, not ORM objects.
+
+    python scripts/bench_product_listing.py                  # in-memory SQLite
+    python scripts/bench_product_listing.py --database-url postgresql://...
+"""
+import argparse
+import os
+import sys
+import time
+
+# Add the parent directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, insert, select
+from sqlalchemy.orm import joinedload
+from app.db.base_class import Base
+from app.models.models import Category, Product, Review, User
+
+def seed(engine, products: int, reviews_per_product: int) -> None:
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        conn.execute(insert(Category), [{"name": "Bench", "description": "Bench"}])
+        conn.execute(insert(User), [
+            {"email": f"u{i}@bench", "username": f"u{i}", "hashed_password": "x"}
+            for i in range(reviews_per_product)
+        ])
+        conn.execute(insert(Product), [
+            {"name": f"Product {i}", "description": "Описание " * 10, "price": 1000.0 + i,
+             "stock": 10, "category_id": 1, "reviews_count": reviews_per_product}
+            for i in range(products)
+        ])
+        conn.execute(insert(Review), [
+            {"user_id": u + 1, "product_id": p + 1, "rating": 1 + (p + u) % 5,
+             "comment": "Отличный товар, рекомендую. " * 8}
+            for p in range(products) for u in range(reviews_per_product)
+        ])
+
+def measure(engine, statement, repeat: int):
+    rows = size = 0
+    started = time.perf_counter()
+    for _ in range(repeat):
+        with engine.connect() as conn:
+            result = conn.execute(statement).all()
+        rows = len(result)
+        size = sum(len(str(v).encode()) for row in result for v in row if v is not None)
+    return rows, size, (time.perf_counter() - started) / repeat * 1000
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default="sqlite://")
+    parser.add_argument("--products", type=int, default=100)
+    parser.add_argument("--reviews-per-product", type=int, default=40)
+    parser.add_argument("--limit", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--seed", action="store_true", help="seed synthetic data (always done for SQLite)")
+    args = parser.parse_args()
+
+    engine = create_engine(args.database_url)
+    if args.seed or args.database_url.startswith("sqlite"):
+        seed(engine, args.products, args.reviews_per_product)
+
+    before = select(Product).options(joinedload(Product.reviews)).order_by(Product.id).limit(args.limit)
+    after = select(Product).options(joinedload(Product.category)).order_by(Product.id).limit(args.limit)
+
+    print(f"{'query':<10}{'rows':>10}{'bytes':>14}{'ms':>10}")
+    results = {}
+    for name, statement in (("before", before), ("after", after)):
+        results[name] = measure(engine, statement, args.repeat)
+        rows, size, ms = results[name]
+        print(f"{name:<10}{rows:>10}{size:>14}{ms:>10.2f}")
+    (rows_b, size_b, _), (rows_a, size_a, _) = results["before"], results["after"]
+    print(f"rows: {rows_b / max(rows_a, 1):.1f}x fewer, bytes: {size_b / max(size_a, 1):.1f}x fewer")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+Compare the cost of turning ORM rows into a JSON response body.
+
+    fastapi   response_model validation + jsonable output + stdlib json
+              (what a list handler returning ORM objects costs by default)
+    orjson    the same FastAPI serialization, encoded by ORJSONResponse
+    fast      app.api.serialization.dump_json: one TypeAdapter validation
+              written straight to bytes by pydantic-core (FAST_JSON)
+
+Rows are built in memory (product pages, cart items, product reviews shaped
+like the real responses), so only serialization is measured.
+
+    python scripts/bench_serialization.py
+    python scripts/bench_serialization.py --rows 100 --repeat 500
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import datetime, timezone
+from typing import List
+
+# Add the parent directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.responses import JSONResponse, ORJSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+from pydantic import TypeAdapter
+from app.api.serialization import dump_json
+from app.models.models import CartItem, Category, Product, Review, User
+from app.schemas import schemas
+
+def make_rows(count: int):
+    now = datetime.now(timezone.utc)
+    category = Category(id=1, name="Видеокарты", description="Графические ускорители")
+    user = User(id=1, email="buyer@example.com", username="buyer", is_admin=False)
+    products = [
+        Product(
+            id=i, name=f"Видеокарта модель {i}", description="Описание товара " * 20,
+            price=35000.0 + i, stock=10, category_id=1, image_url=f"/images/{i}.jpg",
+            rating=4.5, reviews_count=12, category=category,
+        )
+        for i in range(1, count + 1)
+    ]
+    cart_items = [
+        CartItem(id=p.id, user_id=1, product_id=p.id, quantity=1, product=p) for p in products
+    ]
+    reviews = [
+        Review(
+            id=p.id, user_id=1, product_id=products[0].id, rating=5, comment="Отличная карта " * 5,
+            created_at=now, user=user, product=products[0],
+        )
+        for p in products
+    ]
+    return {
+        "products": (List[schemas.Product], products),
+        "cart items": (List[schemas.CartItemResponse], cart_items),
+        "reviews": (List[schemas.Review], reviews),
+    }
+
+def run_sync(coroutine):
+    # serialize_response never awaits for async handlers; driving it by hand
+    # keeps event loop overhead out of the measurement
+    try:
+        coroutine.send(None)
+    except StopIteration as stop:
+        return stop.value
+    raise RuntimeError("serialize_response suspended")
+
+def fastapi_path(response_class):
+    fields = {}
+    def render(model, rows):
+        field = fields.setdefault(model, create_response_field(name="response", type_=model))
+        content = run_sync(serialize_response(field=field, response_content=rows))
+        return response_class(content).body
+    return render
+
+def fast_path(model, rows, adapters={}):
+    adapter = adapters.setdefault(model, TypeAdapter(model))
+    return dump_json(adapter, rows)
+
+def timed(render, model, rows, repeat: int) -> float:
+    render(model, rows)
+    started = time.perf_counter()
+    for _ in range(repeat):
+        render(model, rows)
+    return (time.perf_counter() - started) / repeat
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--rows", type=int, default=100, help="rows per response")
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    paths = {
+        "fastapi": fastapi_path(JSONResponse),
+        "orjson": fastapi_path(ORJSONResponse),
+        "fast": fast_path,
+    }
+    print(f"{args.rows} rows per response, mean of {args.repeat} runs")
+    for name, (model, rows) in make_rows(args.rows).items():
+        baseline = timed(paths["fastapi"], model, rows, args.repeat)
+        print(f"\n{name} ({len(fast_path(model, rows))} bytes)")
+        for path, render in paths.items():
+            elapsed = baseline if path == "fastapi" else timed(render, model, rows, args.repeat)
+            print(f"  {path:<8} {elapsed * 1000:8.2f} ms  x{baseline / elapsed:.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,229 @@
+"""
+Bulk import of a supplier catalog feed.
+
+The feed is streamed from disk in constant memory and loaded into a temporary
+staging table, with COPY on PostgreSQL and batched inserts on SQLite. It is
+then merged in a few set-based statements:
+
+1. missing categories are created in one INSERT ... ON CONFLICT DO NOTHING,
+2. products that predate SKUs are matched to the feed by name once and take
+   its SKU,
+3. all products are upserted in one INSERT ... ON CONFLICT (sku) DO UPDATE
+   that leaves unchanged rows alone; if a SKU occurs more than once, its last
+   line wins.
+
+Everything runs in one transaction, so a failed import leaves the catalog
+untouched. Rating and review counters of existing products are kept.
+
+Feed format: CSV with a header row, or JSON Lines (.jsonl), optionally
+gzipped (.gz), with the fields
+
+    sku, name, description, price, stock, category, image_url
+
+sku, name, price and category are required; lines without them or with an
+unparsable price or stock are skipped and counted. A missing stock is 0.
+
+    python scripts/import_catalog.py feed.csv
+    python scripts/import_catalog.py feed.jsonl.gz --database-url postgresql://...
+
+Running API workers keep serving cached catalog pages until
+RESPONSE_CACHE_TTL_SECONDS has passed.
+"""
+import argparse
+import csv
+import gzip
+import io
+import itertools
+import json
+import os
+import sys
+import time
+from typing import Dict, Iterator, Optional, Tuple
+
+# Add the parent directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text
+from app.db.base import create_tables
+from app.db.session import create_maintenance_engine
+
+FIELDS = ("sku", "name", "description", "price", "stock", "category", "image_url")
+STAGING = "import_products"
+BATCH_SIZE = 5000
+
+STAGING_DDL = {
+    "postgresql": f"""
+        CREATE TEMP TABLE {STAGING} (
+            line bigserial, sku text NOT NULL, name text NOT NULL, description text,
+            price double precision, stock integer, category text, image_url text
+        ) ON COMMIT DROP
+    """,
+    "sqlite": f"""
+        CREATE TEMP TABLE {STAGING} (
+            line INTEGER PRIMARY KEY, sku TEXT NOT NULL, name TEXT NOT NULL, description TEXT,
+            price REAL, stock INTEGER, category TEXT, image_url TEXT
+        )
+    """,
+}
+
+UPDATED_COLUMNS = ("name", "description", "price", "stock", "category_id", "image_url")
+
+# Null-safe inequality, so that re-importing an unchanged feed writes nothing
+IS_DISTINCT = {"postgresql": "IS DISTINCT FROM", "sqlite": "IS NOT"}
+
+MERGE = [
+    ("categories", f"""
+        INSERT INTO categories (name, description)
+        SELECT DISTINCT category, '' FROM {STAGING}
+        WHERE true  -- SQLite cannot parse ON CONFLICT right after a bare SELECT
+        ON CONFLICT (name) DO NOTHING
+    """),
+    ("matched by name", f"""
+        UPDATE products SET sku = feed.sku
+        FROM (SELECT name, max(sku) AS sku FROM {STAGING} GROUP BY name) AS feed
+        WHERE products.sku IS NULL AND products.name = feed.name
+          AND NOT EXISTS (SELECT 1 FROM products AS taken WHERE taken.sku = feed.sku)
+    """),
+    ("products", f"""
+        INSERT INTO products (sku, name, description, price, stock, category_id, image_url, rating)
+        SELECT s.sku, s.name, s.description, s.price, s.stock, c.id, s.image_url, 0.0
+        FROM {STAGING} AS s
+        JOIN categories AS c ON c.name = s.category
+        WHERE s.line IN (SELECT max(line) FROM {STAGING} GROUP BY sku)
+        ON CONFLICT (sku) DO UPDATE SET
+            {", ".join(f"{c} = excluded.{c}" for c in UPDATED_COLUMNS)},
+            updated_at = CURRENT_TIMESTAMP
+        WHERE {{changed}}
+    """),
+]
+
+class FeedReader:
+    """Iterate over the valid rows of a feed as tuples in FIELDS order."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.read = 0
+        self.skipped = 0
+
+    def _records(self) -> Iterator[Dict[str, str]]:
+        opener = gzip.open if self.path.endswith(".gz") else open
+        with opener(self.path, "rt", encoding="utf-8", newline="") as f:
+            if self.path.removesuffix(".gz").endswith(".jsonl"):
+                for line in f:
+                    if line.strip():
+                        yield json.loads(line)
+            else:
+                yield from csv.DictReader(f)
+
+    @staticmethod
+    def _row(record: Dict[str, str]) -> Optional[Tuple]:
+        sku = str(record.get("sku") or "").strip()
+        name = str(record.get("name") or "").strip()
+        category = str(record.get("category") or "").strip()
+        if not sku or not name or not category:
+            return None
+        try:
+            price = float(record["price"])
+            stock = int(record["stock"]) if record.get("stock") not in (None, "") else 0
+        except (KeyError, TypeError, ValueError):
+            return None
+        return (
+            sku, name, record.get("description") or "", price, stock, category,
+            record.get("image_url") or None,
+        )
+
+    def __iter__(self) -> Iterator[Tuple]:
+        for record in self._records():
+            self.read += 1
+            row = self._row(record)
+            if row is None:
+                self.skipped += 1
+                continue
+            yield row
+
+class CsvStream(io.TextIOBase):
+    """File-like view of rows as CSV text, for COPY ... FROM STDIN."""
+
+    def __init__(self, rows: Iterator[Tuple]):
+        self._rows = rows
+        self._buffer = io.StringIO()
+        self._writer = csv.writer(self._buffer, lineterminator="\n")
+        self._pending = ""
+
+    def readable(self) -> bool:
+        return True
+
+    def read(self, size: int = -1) -> str:
+        while size < 0 or len(self._pending) < size:
+            batch = list(itertools.islice(self._rows, 1000))
+            if not batch:
+                break
+            self._writer.writerows(batch)
+            self._pending += self._buffer.getvalue()
+            self._buffer.seek(0)
+            self._buffer.truncate()
+        if size < 0:
+            size = len(self._pending)
+        chunk, self._pending = self._pending[:size], self._pending[size:]
+        return chunk
+
+def load_staging(conn, rows: Iterator[Tuple]) -> None:
+    if conn.dialect.name == "postgresql":
+        cursor = conn.connection.driver_connection.cursor()
+        cursor.copy_expert(
+            # CSV cannot tell an empty description from NULL; products need one
+            f"COPY {STAGING} ({', '.join(FIELDS)}) FROM STDIN "
+            f"WITH (FORMAT csv, FORCE_NOT_NULL (description))",
+            CsvStream(rows),
+        )
+        return
+    insert = text(
+        f"INSERT INTO {STAGING} ({', '.join(FIELDS)}) VALUES ({', '.join(':' + f for f in FIELDS)})"
+    )
+    while batch := list(itertools.islice(rows, BATCH_SIZE)):
+        conn.execute(insert, [dict(zip(FIELDS, row)) for row in batch])
+
+def import_feed(engine, path: str) -> None:
+    # Make sure products.sku and its unique index exist
+    create_tables(engine)
+
+    feed = FeedReader(path)
+    started = time.perf_counter()
+    with engine.begin() as conn:
+        conn.execute(text(STAGING_DDL[engine.dialect.name]))
+        load_staging(conn, iter(feed))
+        loaded = time.perf_counter()
+        print(f"staged {feed.read - feed.skipped} rows ({feed.skipped} skipped) "
+              f"in {loaded - started:.1f}s, {(feed.read - feed.skipped) / max(loaded - started, 1e-9):.0f} rows/s")
+        changed = " OR ".join(
+            f"products.{c} {IS_DISTINCT[engine.dialect.name]} excluded.{c}" for c in UPDATED_COLUMNS
+        )
+        for name, statement in MERGE:
+            step = time.perf_counter()
+            result = conn.execute(text(statement.replace("{changed}", changed)))
+            print(f"{name}: {result.rowcount} rows in {time.perf_counter() - step:.1f}s")
+        if engine.dialect.name == "sqlite":
+            conn.execute(text(f"DROP TABLE {STAGING}"))
+
+    elapsed = time.perf_counter() - started
+    print(f"imported {feed.read - feed.skipped} rows in {elapsed:.1f}s, "
+          f"{(feed.read - feed.skipped) / max(elapsed, 1e-9):.0f} rows/s")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("path", help="CSV or JSONL feed, optionally .gz")
+    parser.add_argument("--database-url", help="defaults to the application database")
+    args = parser.parse_args()
+
+    # COPY and the merge of a 200k+ SKU feed outlast the request statement
+    # timeout of the application engines
+    engine = create_maintenance_engine(args.database_url)
+    try:
+        if engine.dialect.name not in STAGING_DDL:
+            sys.exit(f"Unsupported database: {engine.dialect.name}")
+        import_feed(engine, args.path)
+    finally:
+        engine.dispose()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,25 @@
+import sys
+import os
+
+# Add the parent directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.db.base import create_tables, reconcile_review_stats
+from app.db.session import engine
+
+def main():
+    """
+    Recompute the review aggregates of every product. create_tables() already
+    does this when it adds the columns; rerun it to repair drift.
+    """
+    try:
+        with engine.begin() as conn:
+            count = reconcile_review_stats(conn)
+        print(f"Reconciled review stats for {count} products")
+    except Exception as e:
+        print(f"Error reconciling review stats: {e}")
+
+if __name__ == "__main__":
+    # Adds the aggregate columns to databases created before they existed
+    create_tables()
+    main()
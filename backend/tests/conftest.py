@@ -0,0 +1,150 @@
+"""
+Shared fixtures: every test gets a fresh SQLite database (with the FTS5
+search schema) behind the real app, empty caches, and a small seeded shop.
+"""
+import os
+
+# Cheap hashes; must be set before the app reads its settings
+os.environ.setdefault("BCRYPT_ROUNDS", "4")
+
+from types import SimpleNamespace
+from typing import Dict, List
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import NullPool
+from app.api import deps
+from app.api.pagination import NEXT_CURSOR_HEADER
+from app.api.v1.endpoints import products
+from app.core.config import settings
+from app.core.metrics import instrument_engine
+from app.core.response_cache import response_cache
+from app.core.security import create_access_token, get_password_hash
+from app.db.base import create_tables
+from app.models.models import CartItem, Category, Order, OrderItem, Product, Review, User
+from main import app
+
+PASSWORD = "secret"
+MAX_PAGES = 20
+
+
+@pytest.fixture
+def database(tmp_path):
+    path = tmp_path / "shop.db"
+    sync_engine = create_engine(f"sqlite:///{path}")
+    create_tables(sync_engine)
+    # NullPool: the app's event loop lives in the TestClient's thread
+    async_engine = create_async_engine(f"sqlite+aiosqlite:///{path}", poolclass=NullPool)
+    instrument_engine(async_engine.sync_engine)
+    yield SimpleNamespace(
+        sync_engine=sync_engine,
+        async_engine=async_engine,
+        sessions=async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False),
+    )
+    sync_engine.dispose()
+
+
+@pytest.fixture
+def client(database, monkeypatch):
+    async def get_db():
+        async with database.sessions() as db:
+            yield db
+
+    app.dependency_overrides[deps.get_db] = get_db
+    # The export streams from a session of its own
+    monkeypatch.setattr(products, "AsyncSessionLocal", database.sessions)
+    clear_caches()
+    yield TestClient(app)
+    app.dependency_overrides.pop(deps.get_db, None)
+    clear_caches()
+
+
+def clear_caches() -> None:
+    response_cache.clear()
+    deps.user_cache.clear()
+
+
+@pytest.fixture
+def shop(database):
+    """
+    Two categories and an empty third, six products, an admin (alice) and a
+    customer (bob) with a review, a cart line and an order.
+    """
+    with Session(database.sync_engine) as db:
+        categories = [
+            Category(name="Видеокарты", description="GPU"),
+            Category(name="Процессоры", description="CPU"),
+            Category(name="Пустая", description="Без товаров"),
+        ]
+        db.add_all(categories)
+        db.flush()
+        gpu, cpu, _ = categories
+        items = [
+            Product(name="Видеокарта GeForce RTX 4070", description="Игровая видеокарта", price=60000, stock=5, category_id=gpu.id),
+            Product(name="Видеокарта Radeon RX 7800", description="Видеокарта для игр", price=55000, stock=5, category_id=gpu.id),
+            Product(name="Процессор Ryzen 7 7800X3D", description="Игровой процессор", price=40000, stock=5, category_id=cpu.id),
+            Product(name="Процессор Core i5 13400F", description="Процессор для офиса", price=20000, stock=5, category_id=cpu.id),
+            Product(name="Кулер башенный", description="Охлаждение процессора, подходит к видеокарте", price=3000, stock=5, category_id=cpu.id),
+            Product(name="Термопаста", description="Без связей с заказами", price=500, stock=5, category_id=cpu.id),
+        ]
+        db.add_all(items)
+        alice = User(email="alice@example.com", username="alice", hashed_password=get_password_hash(PASSWORD), is_admin=True)
+        bob = User(email="bob@example.com", username="bob", hashed_password=get_password_hash(PASSWORD))
+        db.add_all([alice, bob])
+        db.flush()
+        review = Review(user_id=bob.id, product_id=items[0].id, rating=5, comment="Отлично")
+        items[0].rating, items[0].rating_sum, items[0].reviews_count = 5.0, 5, 1
+        cart_item = CartItem(user_id=alice.id, product_id=items[0].id, quantity=1)
+        order = Order(user_id=alice.id, total=items[2].price, items=[
+            OrderItem(product_id=items[2].id, quantity=1, price=items[2].price),
+        ])
+        db.add_all([review, cart_item, order])
+        db.commit()
+        return SimpleNamespace(
+            categories=[c.id for c in categories],
+            products=[p.id for p in items],
+            alice=alice.id,
+            bob=bob.id,
+            review=review.id,
+            cart_item=cart_item.id,
+            order=order.id,
+        )
+
+
+def auth_headers(email: str) -> Dict[str, str]:
+    return {"Authorization": f"Bearer {create_access_token(data={'sub': email})}"}
+
+
+def follow(client, url: str, limit: int) -> List[List[dict]]:
+    """GET ``url`` and every page its ``X-Next-Cursor`` leads to."""
+    pages, cursor = [], None
+    for _ in range(MAX_PAGES):
+        params = {"limit": limit, **({"cursor": cursor} if cursor else {})}
+        response = client.get(settings.API_V1_STR + url, params=params)
+        assert response.status_code == 200, response.text
+        pages.append(response.json())
+        cursor = response.headers.get(NEXT_CURSOR_HEADER)
+        if not cursor:
+            return pages
+    raise AssertionError(f"{url} still had a next page after {MAX_PAGES} pages")
+
+
+@pytest.fixture
+def query_log(database, monkeypatch):
+    """
+    Enforce route query budgets (QUERY_BUDGET_MODE=raise) and record every
+    statement the app runs; a request over its budget fails with
+    QueryBudgetExceeded.
+    """
+    monkeypatch.setattr(settings, "QUERY_BUDGET_MODE", "raise")
+    statements: List[str] = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    engine = database.async_engine.sync_engine
+    event.listen(engine, "after_cursor_execute", record)
+    yield statements
+    event.remove(engine, "after_cursor_execute", record)
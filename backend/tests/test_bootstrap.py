@@ -0,0 +1,35 @@
+"""
+bootstrap_database() migrates and seeds an empty database once, through a
+maintenance engine of its own; later startups only compare versions.
+"""
+from sqlalchemy import create_engine, func, select
+from app.db import init_db
+from app.db.session import create_maintenance_engine
+from app.models.models import AppMeta, Product
+
+
+def test_bootstrap_migrates_once_then_only_checks_versions(tmp_path, monkeypatch):
+    url = f"sqlite:///{tmp_path / 'bootstrap.db'}"
+    engine = create_engine(url)
+    opened = []
+
+    def maintenance_engine():
+        opened.append(url)
+        return create_maintenance_engine(url)
+
+    monkeypatch.setattr(init_db, "engine", engine)
+    monkeypatch.setattr(init_db, "create_maintenance_engine", maintenance_engine)
+
+    init_db.bootstrap_database()
+    assert len(opened) == 1
+    with engine.connect() as conn:
+        versions = dict(conn.execute(select(AppMeta.key, AppMeta.value)).all())
+        assert versions == {
+            "schema_version": init_db.schema_version(),
+            "seed_version": init_db.seed_version(),
+        }
+        assert conn.execute(select(func.count()).select_from(Product)).scalar() == len(init_db.PRODUCTS)
+
+    init_db.bootstrap_database()
+    assert len(opened) == 1
+    engine.dispose()
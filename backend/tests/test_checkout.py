@@ -0,0 +1,44 @@
+"""
+Checkout claims the cart before taking stock, so a repeated checkout of the
+same cart cannot order it twice, and a failed one leaves the cart intact.
+"""
+from sqlalchemy import select, update
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.models.models import CartItem, Order, Product
+from tests.conftest import auth_headers
+
+CHECKOUT = settings.API_V1_STR + "/orders/checkout"
+ALICE = "alice@example.com"
+
+
+def stock_and_orders(database, shop):
+    with Session(database.sync_engine) as session:
+        stock = session.get(Product, shop.products[0]).stock
+        orders = session.scalars(select(Order.id).where(Order.user_id == shop.alice)).all()
+        cart = session.scalars(select(CartItem.id).where(CartItem.user_id == shop.alice)).all()
+    return stock, len(orders), len(cart)
+
+
+def test_second_checkout_of_a_cart_finds_it_empty(client, database, shop):
+    stock, orders, _ = stock_and_orders(database, shop)
+
+    first = client.post(CHECKOUT, headers=auth_headers(ALICE))
+    assert first.status_code == 200, first.text
+    second = client.post(CHECKOUT, headers=auth_headers(ALICE))
+    assert second.status_code == 400
+    assert second.json()["detail"] == "Cart is empty"
+
+    assert stock_and_orders(database, shop) == (stock - 1, orders + 1, 0)
+
+
+def test_checkout_without_stock_keeps_the_cart(client, database, shop):
+    with database.sync_engine.begin() as conn:
+        conn.execute(update(Product).where(Product.id == shop.products[0]).values(stock=0))
+    _, orders, _ = stock_and_orders(database, shop)
+
+    response = client.post(CHECKOUT, headers=auth_headers(ALICE))
+    assert response.status_code == 400
+    assert response.json()["detail"] == f"Not enough stock: {shop.products[0]}"
+
+    assert stock_and_orders(database, shop) == (0, orders, 1)
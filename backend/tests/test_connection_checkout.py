@@ -0,0 +1,36 @@
+"""
+An authenticated request checks out one pooled connection: the user lookup
+and the handler share the request's session (see ``deps.get_db``).
+"""
+import pytest
+from sqlalchemy import event
+from app.core.config import settings
+from tests.conftest import auth_headers, clear_caches
+
+
+@pytest.fixture
+def checkouts(database):
+    pool = database.async_engine.sync_engine.pool
+    recorded = []
+
+    def record(dbapi_connection, connection_record, connection_proxy):
+        recorded.append(connection_record)
+
+    event.listen(pool, "checkout", record)
+    yield recorded
+    event.remove(pool, "checkout", record)
+
+
+@pytest.mark.parametrize("method, url, add_product", [
+    ("GET", "/cart/items", False),
+    ("GET", "/cart/summary", False),
+    ("POST", "/cart/items", True),
+])
+def test_authenticated_request_checks_out_one_connection(client, shop, checkouts, method, url, add_product):
+    body = {"product_id": shop.products[1], "quantity": 1} if add_product else None
+    clear_caches()  # the user lookup must hit the database too
+    response = client.request(
+        method, settings.API_V1_STR + url, json=body, headers=auth_headers("alice@example.com")
+    )
+    assert response.status_code == 200, response.text
+    assert len(checkouts) == 1
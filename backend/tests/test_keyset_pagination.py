@@ -0,0 +1,45 @@
+"""
+Following X-Next-Cursor visits every row exactly once, in order, including
+rows whose sort key ties (timestamps stamped within the same second).
+"""
+from sqlalchemy import insert
+from app.models.models import Category, Product, Review, User
+from tests.conftest import follow
+
+
+def test_newest_products_page_through_tied_timestamps(client, database):
+    with database.sync_engine.begin() as conn:
+        category_id = conn.execute(
+            insert(Category).values(name="Корпуса", description="").returning(Category.id)
+        ).scalar_one()
+        # One statement, so created_at (CURRENT_TIMESTAMP) is equal for all
+        conn.execute(insert(Product), [
+            {"name": f"Корпус {i}", "description": "", "price": 5000 + i, "stock": 1, "category_id": category_id}
+            for i in range(25)
+        ])
+
+    for url in ("/products/?sort=newest", f"/products/?sort=newest&category_id={category_id}"):
+        pages = follow(client, url, limit=10)
+        ids = [p["id"] for page in pages for p in page]
+        assert [len(page) for page in pages] == [10, 10, 5]
+        assert ids == sorted(ids, reverse=True)
+        assert len(set(ids)) == 25
+
+
+def test_product_reviews_page_through_tied_timestamps(client, database, shop):
+    product_id = shop.products[1]
+    with database.sync_engine.begin() as conn:
+        user_ids = conn.execute(
+            insert(User).returning(User.id, sort_by_parameter_order=True),
+            [{"email": f"r{i}@example.com", "username": f"r{i}", "hashed_password": "x"} for i in range(25)],
+        ).scalars().all()
+        conn.execute(insert(Review), [
+            {"user_id": user_id, "product_id": product_id, "rating": 1 + i % 5, "comment": f"Отзыв {i}"}
+            for i, user_id in enumerate(user_ids)
+        ])
+
+    pages = follow(client, f"/reviews/product/{product_id}", limit=10)
+    reviews = [r for page in pages for r in page]
+    assert [len(page) for page in pages] == [10, 10, 5]
+    assert [r["id"] for r in reviews] == sorted((r["id"] for r in reviews), reverse=True)
+    assert {r["username"] for r in reviews} == {f"r{i}" for i in range(25)}
@@ -0,0 +1,113 @@
+"""
+Every API route runs within the query budget it declares, with cold caches
+(the user lookup of authenticated routes included).
+"""
+from typing import Callable, Dict, Tuple
+import pytest
+from passlib.context import CryptContext
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+from app.api.v1.api import api_router
+from app.core.config import settings
+from app.models.models import User
+from tests.conftest import PASSWORD, auth_headers, clear_caches
+
+ALICE = "alice@example.com"
+BOB = "bob@example.com"
+
+# (method, path) -> shop -> (method, url, request kwargs, user or None)
+Call = Tuple[str, str, Dict, str]
+ROUTE_CALLS: Dict[Tuple[str, str], Callable[..., Call]] = {
+    ("POST", "/auth/register"): lambda s: ("post", "/auth/register", {"json": {"email": "carol@example.com", "username": "carol", "password": PASSWORD}}, None),
+    ("POST", "/auth/login"): lambda s: ("post", "/auth/login", {"data": {"username": "alice", "password": PASSWORD}}, None),
+    ("GET", "/cart/items"): lambda s: ("get", "/cart/items", {}, ALICE),
+    ("GET", "/cart/summary"): lambda s: ("get", "/cart/summary", {}, ALICE),
+    ("POST", "/cart/items"): lambda s: ("post", "/cart/items", {"json": {"product_id": s.products[1], "quantity": 1}}, ALICE),
+    ("POST", "/cart/items/batch"): lambda s: ("post", "/cart/items/batch", {"json": {"items": [
+        {"product_id": s.products[1], "quantity": 1}, {"product_id": s.products[2], "quantity": 2},
+    ]}}, ALICE),
+    ("PUT", "/cart/items/batch"): lambda s: ("put", "/cart/items/batch", {"json": {"items": [{"id": s.cart_item, "quantity": 3}]}}, ALICE),
+    ("DELETE", "/cart/items/batch"): lambda s: ("delete", f"/cart/items/batch?ids={s.cart_item}", {}, ALICE),
+    ("PUT", "/cart/items/{item_id}"): lambda s: ("put", f"/cart/items/{s.cart_item}", {"json": {"quantity": 3}}, ALICE),
+    ("DELETE", "/cart/items/{item_id}"): lambda s: ("delete", f"/cart/items/{s.cart_item}", {}, ALICE),
+    ("GET", "/categories/"): lambda s: ("get", "/categories/", {}, None),
+    ("POST", "/categories/"): lambda s: ("post", "/categories/", {"json": {"name": "Память", "description": "RAM"}}, ALICE),
+    ("GET", "/categories/{category_id}"): lambda s: ("get", f"/categories/{s.categories[0]}", {}, None),
+    ("PUT", "/categories/{category_id}"): lambda s: ("put", f"/categories/{s.categories[0]}", {"json": {"name": "GPU", "description": "Видеокарты"}}, ALICE),
+    ("DELETE", "/categories/{category_id}"): lambda s: ("delete", f"/categories/{s.categories[2]}", {}, ALICE),
+    ("GET", "/monitoring/db-pool"): lambda s: ("get", "/monitoring/db-pool", {}, None),
+    ("POST", "/orders/checkout"): lambda s: ("post", "/orders/checkout", {}, ALICE),
+    ("GET", "/orders/"): lambda s: ("get", "/orders/", {}, ALICE),
+    ("GET", "/orders/{order_id}"): lambda s: ("get", f"/orders/{s.order}", {}, ALICE),
+    ("GET", "/products/"): lambda s: ("get", f"/products/?category_id={s.categories[0]}&sort=price_asc", {}, None),
+    ("GET", "/products/facets"): lambda s: ("get", "/products/facets", {}, None),
+    ("GET", "/products/search"): lambda s: ("get", "/products/search?q=видеокарта", {}, None),
+    ("GET", "/products/export"): lambda s: ("get", "/products/export?format=csv", {}, None),
+    ("POST", "/products/"): lambda s: ("post", "/products/", {"json": {
+        "name": "Блок питания", "description": "750 Вт", "price": 9000, "stock": 3, "category_id": s.categories[1],
+    }}, ALICE),
+    ("GET", "/products/{product_id}"): lambda s: ("get", f"/products/{s.products[0]}", {}, None),
+    ("PUT", "/products/{product_id}"): lambda s: ("put", f"/products/{s.products[0]}", {"json": {
+        "name": "Видеокарта GeForce RTX 4070 Super", "description": "Игровая видеокарта", "price": 65000,
+        "stock": 4, "category_id": s.categories[0],
+    }}, ALICE),
+    ("DELETE", "/products/{product_id}"): lambda s: ("delete", f"/products/{s.products[5]}", {}, ALICE),
+    ("POST", "/reviews/"): lambda s: ("post", "/reviews/", {"json": {"product_id": s.products[1], "rating": 4, "comment": "Хорошо"}}, ALICE),
+    ("GET", "/reviews/product/{product_id}"): lambda s: ("get", f"/reviews/product/{s.products[0]}", {}, None),
+    ("GET", "/reviews/user/me"): lambda s: ("get", "/reviews/user/me", {}, BOB),
+    ("PUT", "/reviews/{review_id}"): lambda s: ("put", f"/reviews/{s.review}", {"json": {"rating": 3, "comment": "Нормально"}}, BOB),
+    ("DELETE", "/reviews/{review_id}"): lambda s: ("delete", f"/reviews/{s.review}", {}, BOB),
+    ("POST", "/users/"): lambda s: ("post", "/users/", {"json": {"email": "dave@example.com", "username": "dave", "password": PASSWORD}}, ALICE),
+    ("GET", "/users/me"): lambda s: ("get", "/users/me", {}, BOB),
+    ("GET", "/users/{user_id}"): lambda s: ("get", f"/users/{s.bob}", {}, ALICE),
+    ("GET", "/users/"): lambda s: ("get", "/users/", {}, ALICE),
+}
+
+ROUTES = [(method, route) for route in api_router.routes for method in sorted(route.methods)]
+
+
+def declared_budget(route) -> bool:
+    return any(
+        getattr(d.dependency, "__name__", "") == "declare_query_budget" for d in route.dependencies
+    )
+
+
+def call(client, shop, key):
+    method, url, kwargs, user = ROUTE_CALLS[key](shop)
+    if user:
+        kwargs.setdefault("headers", auth_headers(user))
+    clear_caches()
+    return getattr(client, method)(settings.API_V1_STR + url, **kwargs)
+
+
+@pytest.mark.parametrize("method, route", ROUTES, ids=[f"{m} {r.path}" for m, r in ROUTES])
+def test_route_stays_within_query_budget(client, shop, query_log, method, route):
+    assert declared_budget(route), f"{method} {route.path} declares no query_budget"
+    key = (method, route.path)
+    assert key in ROUTE_CALLS, f"add a request for {method} {route.path} to ROUTE_CALLS"
+    response = call(client, shop, key)
+    assert response.status_code == 200, response.text
+
+
+def test_search_typo_fallback_within_budget(client, shop, query_log):
+    # No word starts with "идеокарт", so only the fallback query finds it
+    response = client.get(f"{settings.API_V1_STR}/products/search?q=идеокарт")
+    assert response.status_code == 200
+    assert {p["id"] for p in response.json()} == set(shop.products[:2])
+
+
+def test_login_with_outdated_hash_within_budget(client, shop, database, query_log):
+    outdated = CryptContext(schemes=["bcrypt"], bcrypt__rounds=settings.BCRYPT_ROUNDS + 1)
+    with Session(database.sync_engine) as db:
+        db.execute(update(User).where(User.id == shop.bob).values(hashed_password=outdated.hash(PASSWORD)))
+        db.commit()
+    response = client.post(f"{settings.API_V1_STR}/auth/login", data={"username": "bob", "password": PASSWORD})
+    assert response.status_code == 200
+    assert any(s.startswith("UPDATE users") for s in query_log)
+
+
+def test_cart_item_quantity_change_within_budget(client, shop, query_log):
+    response = call(client, shop, ("PUT", "/cart/items/{item_id}"))
+    assert response.status_code == 200
+    assert response.json()["quantity"] == 3
+    assert any(s.startswith("UPDATE cart_items") for s in query_log)
@@ -0,0 +1,29 @@
+"""
+create_tables() upgrades a database created by an older version of the
+models in place, including the data new columns derive from.
+"""
+from sqlalchemy import insert, text, update
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.db.base import create_tables
+from app.models.models import Product, Review
+
+
+def test_added_review_aggregates_start_from_existing_reviews(client, database, shop):
+    with database.sync_engine.begin() as conn:
+        conn.execute(insert(Review).values(user_id=shop.alice, product_id=shop.products[0], rating=2))
+        conn.execute(update(Product).where(Product.id == shop.products[0]).values(rating=3.5))
+        # As before the aggregate columns existed
+        conn.execute(text("ALTER TABLE products DROP COLUMN reviews_count"))
+        conn.execute(text("ALTER TABLE products DROP COLUMN rating_sum"))
+
+    create_tables(database.sync_engine)
+
+    with Session(database.sync_engine) as session:
+        reviewed = session.get(Product, shop.products[0])
+        assert (reviewed.reviews_count, reviewed.rating_sum, reviewed.rating) == (2, 7, 3.5)
+        unreviewed = session.get(Product, shop.products[1])
+        assert (unreviewed.reviews_count, unreviewed.rating_sum) == (0, 0)
+
+    response = client.get(f"{settings.API_V1_STR}/products/{shop.products[0]}")
+    assert response.json()["reviews_count"] == 2
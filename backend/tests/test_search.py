@@ -0,0 +1,60 @@
+"""
+Product search on SQLite: the FTS5 ``products_fts`` index ranked by bm25,
+and the name LIKE fallback for queries that match nothing.
+"""
+from app.api.pagination import NEXT_CURSOR_HEADER
+from app.core.config import settings
+from tests.conftest import follow
+
+SEARCH = settings.API_V1_STR + "/products/search"
+
+
+def ids(products):
+    return [p["id"] for p in products]
+
+
+def test_name_matches_rank_above_description_matches(client, shop):
+    response = client.get(SEARCH, params={"q": "видеокарт"})
+    assert response.status_code == 200, response.text
+    found = ids(response.json())
+    # Both GPUs match in name and description, the cooler only mentions one
+    assert sorted(found[:2]) == shop.products[:2]
+    assert found[2:] == [shop.products[4]]
+
+
+def test_category_filter(client, shop):
+    gpus, cpus, empty = shop.categories
+    for category_id, expected in ((gpus, shop.products[:2]), (cpus, [shop.products[4]]), (empty, [])):
+        response = client.get(SEARCH, params={"q": "видеокарт", "category_id": category_id})
+        assert response.status_code == 200, response.text
+        assert sorted(ids(response.json())) == expected
+
+
+def test_cursor_continues_in_rank_order(client, shop):
+    first = client.get(SEARCH, params={"q": "видеокарт", "limit": 1})
+    assert first.headers[NEXT_CURSOR_HEADER].startswith("t.")
+
+    pages = follow(client, "/products/search?q=видеокарт", limit=1)
+    assert [len(page) for page in pages] == [1, 1, 1]
+    ranked = ids(client.get(SEARCH, params={"q": "видеокарт"}).json())
+    assert [p["id"] for page in pages for p in page] == ranked
+
+
+def test_typo_falls_back_to_name_similarity(client, shop, query_log):
+    response = client.get(SEARCH, params={"q": "идеокарт"})
+    assert response.status_code == 200, response.text
+    # Nothing starts with the term; the shorter name is the closer match
+    assert ids(response.json()) == [shop.products[1], shop.products[0]]
+    assert len(query_log) == 2
+
+    # The fallback keeps its mode in the cursor
+    first = client.get(SEARCH, params={"q": "идеокарт", "limit": 1})
+    assert first.headers[NEXT_CURSOR_HEADER].startswith("f.")
+    pages = follow(client, "/products/search?q=идеокарт", limit=1)
+    assert [p["id"] for page in pages for p in page] == [shop.products[1], shop.products[0]]
+
+
+def test_query_syntax_is_searched_literally(client, shop):
+    response = client.get(SEARCH, params={"q": 'видеокарт" OR NEAR(*'})
+    assert response.status_code == 200, response.text
+    assert response.json() == []
@@ -30,9 +30,7 @@ interface Review {
   rating: number;
   comment: string;
   created_at: string;
-  user: {
-    username: string;
-  };
+  username: string;
 }
 
 const ProductDetail: React.FC = () => {
@@ -40,6 +38,8 @@ const ProductDetail: React.FC = () => {
   const navigate = useNavigate();
   const [product, setProduct] = useState<Product | null>(null);
   const [reviews, setReviews] = useState<Review[]>([]);
+  // Cursor of the next page of reviews, null on the last page
+  const [reviewsCursor, setReviewsCursor] = useState<string | null>(null);
 
   useEffect(() => {
     const fetchProduct = async () => {
@@ -63,6 +63,7 @@ const ProductDetail: React.FC = () => {
         if (response.ok) {
           const data = await response.json();
           setReviews(data);
+          setReviewsCursor(response.headers.get('X-Next-Cursor'));
         }
       } catch (error) {
         console.error('Error fetching reviews:', error);
@@ -105,6 +106,22 @@ const ProductDetail: React.FC = () => {
     }
   };
 
+  const loadMoreReviews = async () => {
+    if (!reviewsCursor) return;
+    try {
+      const response = await fetch(
+        `${process.env.REACT_APP_API_URL}/api/v1/reviews/product/${id}?cursor=${encodeURIComponent(reviewsCursor)}`
+      );
+      if (response.ok) {
+        const data = await response.json();
+        setReviews((loaded) => [...loaded, ...data]);
+        setReviewsCursor(response.headers.get('X-Next-Cursor'));
+      }
+    } catch (error) {
+      console.error('Error fetching reviews:', error);
+    }
+  };
+
   const handleReviewSubmitted = () => {
     // Перезагружаем отзывы и информацию о товаре
     const fetchReviews = async () => {
@@ -113,6 +130,7 @@ const ProductDetail: React.FC = () => {
         if (response.ok) {
           const data = await response.json();
           setReviews(data);
+          setReviewsCursor(response.headers.get('X-Next-Cursor'));
         }
       } catch (error) {
         console.error('Error fetching reviews:', error);
@@ -233,7 +251,11 @@ const ProductDetail: React.FC = () => {
       {/* Reviews Section */}
       <Box sx={{ mt: 6 }}>
         <ReviewForm productId={product.id} onReviewSubmitted={handleReviewSubmitted} />
-        <ReviewList reviews={reviews} />
+        <ReviewList
+          reviews={reviews}
+          total={product.reviews_count}
+          onLoadMore={reviewsCursor ? loadMoreReviews : undefined}
+        />
       </Box>
     </Container>
   );
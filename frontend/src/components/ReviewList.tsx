@@ -6,6 +6,7 @@ import {
   Rating,
   Avatar,
   Divider,
+  Button,
 } from '@mui/material';
 import { format } from 'date-fns';
 
@@ -14,16 +15,16 @@ interface Review {
   rating: number;
   comment: string;
   created_at: string;
-  user: {
-    username: string;
-  };
+  username: string;
 }
 
 interface ReviewListProps {
   reviews: Review[];
+  total?: number;
+  onLoadMore?: () => void;
 }
 
-const ReviewList: React.FC<ReviewListProps> = ({ reviews }) => {
+const ReviewList: React.FC<ReviewListProps> = ({ reviews, total, onLoadMore }) => {
   if (reviews.length === 0) {
     return (
       <Paper sx={{ p: 3, background: 'linear-gradient(135deg, #1a1a1a 0%, #2a2a2a 100%)', border: '1px solid #FFD700' }}>
@@ -37,7 +38,7 @@ const ReviewList: React.FC<ReviewListProps> = ({ reviews }) => {
   return (
     <Box>
       <Typography variant="h6" sx={{ color: '#FFD700', mb: 2, textShadow: '1px 1px 2px rgba(0,0,0,0.8)' }}>
-        Отзывы ({reviews.length})
+        Отзывы ({total ?? reviews.length})
       </Typography>
       
       {reviews.map((review, index) => (
@@ -63,11 +64,11 @@ const ReviewList: React.FC<ReviewListProps> = ({ reviews }) => {
                 mr: 2,
               }}
             >
-              {review.user.username.charAt(0).toUpperCase()}
+              {review.username.charAt(0).toUpperCase()}
             </Avatar>
             <Box sx={{ flexGrow: 1 }}>
               <Typography variant="subtitle1" sx={{ color: '#FFD700', fontWeight: 'bold' }}>
-                {review.user.username}
+                {review.username}
               </Typography>
               <Typography variant="caption" sx={{ color: '#FFE55C' }}>
                 {format(new Date(review.created_at), 'dd MMM yyyy')}
@@ -100,6 +101,17 @@ const ReviewList: React.FC<ReviewListProps> = ({ reviews }) => {
           </Typography>
         </Paper>
       ))}
+
+      {onLoadMore && (
+        <Button
+          variant="outlined"
+          onClick={onLoadMore}
+          fullWidth
+          sx={{ color: '#FFD700', borderColor: '#FFD700', '&:hover': { borderColor: '#FFE55C' } }}
+        >
+          Показать ещё отзывы
+        </Button>
+      )}
     </Box>
   );
 };